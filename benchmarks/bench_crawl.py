@@ -0,0 +1,138 @@
+"""完整爬取流程的离线基准测试
+
+在子进程中启动本地模拟网站（fake_site.py），用 crawl_pdfs 爬取并下载全部
+PDF，报告页面/秒、MB/秒、首个文件用时、峰值内存和CPU时间。网站运行在
+独立进程中，CPU时间和内存只统计爬虫本身。不需要网络。
+
+用法: python benchmarks/bench_crawl.py [--years 2021-2025] [--pdf-kb 256] [--latency-ms 20] [--json]
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError:  # Windows上没有resource模块，不报告峰值内存
+    resource = None
+
+from bench_parse import load_scraper
+from fake_site import add_site_arguments, config_from_args
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def peak_rss_mb():
+    """本进程的峰值常驻内存（MB），不支持时返回None"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux以KB为单位，macOS以字节为单位
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def start_site(args):
+    """在子进程中启动模拟网站，返回 (进程, 网站地址)"""
+    command = [sys.executable, os.path.join(BENCH_DIR, "fake_site.py"), "--port", "0",
+               "--years", args.years, "--months", str(args.months),
+               "--pdfs-per-page", str(args.pdfs_per_page), "--anchors", str(args.anchors),
+               "--pdf-kb", str(args.pdf_kb), "--latency-ms", str(args.latency_ms)]
+    if args.pdf_latency_ms is not None:
+        command += ["--pdf-latency-ms", str(args.pdf_latency_ms)]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    url = process.stdout.readline().strip()
+    if not url:
+        process.kill()
+        raise RuntimeError("模拟网站启动失败")
+    return process, url
+
+
+def run_crawl(scraper, url, folder, args):
+    """爬取一次，返回测量结果"""
+    metrics = scraper.metrics
+    pages_before = metrics.value("pdf_scraper_pages_fetched_total")
+    bytes_before = metrics.value("pdf_scraper_bytes_transferred_total", kind="pdf")
+    job = scraper.CrawlJob(url, folder, args.start_year, args.end_year)
+
+    cpu_started = time.process_time()
+    started = time.perf_counter()
+    files = scraper.crawl_pdfs(url, folder, args.start_year, args.end_year,
+                               workers=args.workers, discovery_workers=args.discovery_workers,
+                               per_host_limit=args.per_host, incremental=args.incremental,
+                               page_cache=args.page_cache, sitemaps=args.sitemaps,
+                               max_pages=args.max_pages, bandwidth_limit=args.bandwidth * 1024,
+                               byte_budget=args.max_mb * 1024 * 1024, job=job)
+    elapsed = time.perf_counter() - started
+    cpu_time = time.process_time() - cpu_started
+
+    pages = metrics.value("pdf_scraper_pages_fetched_total") - pages_before
+    transferred = metrics.value("pdf_scraper_bytes_transferred_total", kind="pdf") - bytes_before
+    return {
+        "state": job.state,
+        "files": len(files),
+        "unchanged": job.progress["unchanged"],
+        "pages": pages,
+        "seconds": round(elapsed, 3),
+        "pages_per_second": round(pages / elapsed, 1) if elapsed else None,
+        "mb": round(transferred / (1024 * 1024), 2),
+        "mb_per_second": round(transferred / (1024 * 1024) / elapsed, 2) if elapsed else None,
+        "first_file_seconds": job.progress["first_file_seconds"],
+        "cpu_seconds": round(cpu_time, 3),
+        "peak_rss_mb": round(peak_rss_mb(), 1) if resource is not None else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_site_arguments(parser)
+    parser.add_argument("--start-year", default="", help="爬取的起始年份（默认不限）")
+    parser.add_argument("--end-year", default="", help="爬取的结束年份（默认不限）")
+    parser.add_argument("--workers", type=int, default=4, help="下载线程数")
+    parser.add_argument("--discovery-workers", type=int, default=4, help="页面抓取线程数")
+    parser.add_argument("--per-host", type=int, default=8, help="单主机并发上限")
+    parser.add_argument("--incremental", action="store_true", help="再运行一次增量爬取（测量全部未变化时的用时）")
+    parser.add_argument("--page-cache", action="store_true", help="启用列表页缓存（与 --incremental 一起测量再次爬取）")
+    parser.add_argument("--sitemaps", action="store_true", help="先读取站点地图和RSS，只浅层遍历网页")
+    parser.add_argument("--max-pages", type=int, default=0, help="页面数上限，0为不限")
+    parser.add_argument("--bandwidth", type=int, default=0, help="下载带宽上限（KB/秒），0为不限")
+    parser.add_argument("--max-mb", type=int, default=0, help="下载字节预算（MB），0为不限")
+    parser.add_argument("--json", action="store_true", help="以JSON输出结果，便于比较不同版本")
+    args = parser.parse_args()
+
+    expected = config_from_args(args).expected_pdfs(args.start_year, args.end_year)
+    scraper = load_scraper()
+    process, url = start_site(args)
+    folder = tempfile.mkdtemp(prefix="bench_crawl_")
+    try:
+        results = {"full": run_crawl(scraper, url, folder, args)}
+        if args.incremental:
+            results["incremental"] = run_crawl(scraper, url, folder, args)
+    finally:
+        process.kill()
+        process.wait()
+        shutil.rmtree(folder, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps({"expected_files": expected, **results}, ensure_ascii=False))
+        return
+
+    print(f"模拟网站: {args.years}, 每年 {args.months} 页, 每页 {args.anchors} 个链接 / "
+          f"{args.pdfs_per_page} 个PDF, PDF {args.pdf_kb} KB, 延迟 {args.latency_ms} ms")
+    for name, result in results.items():
+        print(f"[{name}] 状态 {result['state']}, 文件 {result['files']} / {expected}, "
+              f"未变化 {result['unchanged']}, 页面 {result['pages']}")
+        print(f"  用时 {result['seconds']:.2f} 秒, {result['pages_per_second']} 页面/秒, "
+              f"{result['mb']} MB, {result['mb_per_second']} MB/秒")
+        print(f"  首个文件 {result['first_file_seconds']} 秒, CPU {result['cpu_seconds']} 秒, "
+              f"峰值内存 {result['peak_rss_mb'] if result['peak_rss_mb'] is not None else '不可用'} MB")
+    if results["full"]["files"] != expected and not (args.max_pages or args.max_mb):
+        print(f"警告: 下载的文件数与预期不符 ({results['full']['files']} / {expected})")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""链接年份过滤和文件命名的微基准测试
+
+对比旧的实现（每个链接多次 re.search，取URL中第一个 20xx）和 parse_link 的
+预编译、带缓存的实现，并列出两者年份判断不一致的链接。
+
+默认使用按常见政府网站链接格式生成的语料；也可以用 --corpus 指定真实抓取的
+链接文件（每行 "URL<TAB>链接文本"）。
+
+用法: python benchmarks/bench_extract.py [--links 50000] [--repeat 3] [--corpus links.tsv]
+"""
+import argparse
+import random
+import re
+from urllib.parse import urlparse
+
+from bench_parse import best_of, load_scraper
+
+
+def legacy_extract_year(text):
+    year_match = re.search(r'(20\d{2})[年\-]', text)
+    return year_match.group(1) if year_match else None
+
+
+def legacy_extract_month(text):
+    month_match = re.search(r'(\d{1,2})[月\-]', text)
+    return month_match.group(1).zfill(2) if month_match else None
+
+
+def legacy_extract_name(text):
+    name_match = re.search(r'(造价[信息]*|信息价|定额|指数|参考价|市场价|建设工程)', text)
+    return name_match.group(1) if name_match else None
+
+
+def legacy_file_name(url, original_name):
+    """旧的 generate_file_name"""
+    path_text = urlparse(url).path.replace('/', ' ').strip()
+    year = legacy_extract_year(path_text) or legacy_extract_year(original_name)
+    month = legacy_extract_month(path_text) or legacy_extract_month(original_name)
+    name_part = legacy_extract_name(path_text) or legacy_extract_name(original_name) or "信息价"
+    if year and month:
+        return f"{year}年{month}月{name_part}.pdf"
+    if year:
+        return f"{year}年{name_part}.pdf"
+    return original_name
+
+
+def legacy_year(url, text):
+    """旧的 is_in_year_range 使用的年份: URL加文本中第一个 20xx"""
+    year_match = re.search(r'(20\d{2})', url + " " + text)
+    return int(year_match.group(1)) if year_match else None
+
+
+def build_corpus(count, seed=1):
+    """生成链接语料，格式参考常见的造价信息发布网站；列表页之间有大量重复链接"""
+    rng = random.Random(seed)
+    districts = ("朝阳区", "海淀区", "浦东新区", "密云县", "")
+    hosts = ("http://zjz.example.gov.cn", "http://10.20.24.5:8080", "https://www.example.gov.cn:2019")
+    unique = []
+    for i in range(max(count // 4, 1)):
+        year = rng.randint(2015, 2025)
+        month = rng.randint(1, 12)
+        publish = f"{year}{month:02d}{rng.randint(1, 28):02d}"
+        host = rng.choice(hosts)
+        district = rng.choice(districts)
+        kind = i % 6
+        if kind == 0:
+            url = f"{host}/zjxx/{year}/{month:02d}/P0{publish}{rng.randint(100, 999)}.pdf"
+            text = f"{year}年{month}月{district}建设工程造价信息价"
+        elif kind == 1:
+            url = f"{host}/xxgk/t{publish}_{rng.randint(100000, 999999)}.html"
+            text = f"关于发布{year}年第{rng.randint(1, 12)}期{district}工程造价信息的通知"
+        elif kind == 2:
+            url = f"{host}/upload/files/{year}-{month:02d}/{rng.randint(1, 200)}.pdf"
+            text = f"{district}{month}月份材料市场价"
+        elif kind == 3:
+            url = f"{host}/content/content_{rng.randint(100000, 999999)}.pdf"
+            text = f"{year}年{district}定额补充说明"
+        elif kind == 4:
+            url = f"{host}/attach/0/{rng.randint(1000000000, 9999999999)}.pdf"
+            text = "附件下载"
+        else:
+            url = f"{host}/n{rng.randint(1, 60)}.html"
+            text = f"栏目{rng.randint(1, 60)}"
+        unique.append((url, text))
+    return [rng.choice(unique) for _ in range(count)]
+
+
+def load_corpus(path):
+    links = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            url, _, text = line.rstrip("\n").partition("\t")
+            if url:
+                links.append((url, text))
+    return links
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--links", type=int, default=50000, help="生成的链接数")
+    parser.add_argument("--repeat", type=int, default=3, help="每种实现的运行次数")
+    parser.add_argument("--corpus", help="真实链接文件，每行 URL<TAB>链接文本")
+    parser.add_argument("--show", type=int, default=10, help="显示的不一致样例数")
+    args = parser.parse_args()
+
+    scraper = load_scraper()
+    links = load_corpus(args.corpus) if args.corpus else build_corpus(args.links)
+    print(f"链接 {len(links)} 个（不重复 {len(set(links))} 个）")
+
+    def legacy_run():
+        return [(legacy_year(url, text), legacy_file_name(url, url.split('/')[-1])) for url, text in links]
+
+    def new_run():
+        return [(scraper.parse_link(url, text).year, scraper.generate_file_name(url, url.split('/')[-1], text))
+                for url, text in links]
+
+    def new_run_cold():
+        scraper.parse_link.cache_clear()
+        scraper.parse_text_info.cache_clear()
+        return new_run()
+
+    legacy_time, legacy_result = best_of(legacy_run, args.repeat)
+    cold_time, new_result = best_of(new_run_cold, args.repeat)
+    warm_time, _ = best_of(new_run, args.repeat)
+    print(f"  旧实现:            {legacy_time * 1000:8.1f} ms")
+    print(f"  parse_link (冷缓存): {cold_time * 1000:8.1f} ms ({legacy_time / cold_time:.1f}x)")
+    print(f"  parse_link (热缓存): {warm_time * 1000:8.1f} ms ({legacy_time / warm_time:.1f}x)")
+
+    differences = {}
+    for (url, text), (old_year, old_name), (new_year, new_name) in zip(links, legacy_result, new_result):
+        if old_year != new_year or old_name != new_name:
+            differences[(url, text)] = (old_year, new_year, old_name, new_name)
+    print(f"年份或文件名不一致的链接: {len(differences)} 个（不重复）")
+    for (url, text), (old_year, new_year, old_name, new_name) in list(differences.items())[:args.show]:
+        print(f"  {url} | {text}")
+        print(f"    年份 {old_year} -> {new_year}, 文件名 {old_name} -> {new_name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""页面链接提取的微基准测试
+
+对比旧的解析路径（多次尝试解码 + 完整BeautifulSoup树 + find_all）和
+detect_charset/extract_links 的新路径。测试页面模拟大型中文信息价列表页。
+
+用法: python benchmarks/bench_parse.py [--anchors 5000] [--repeat 5]
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+
+from bs4 import BeautifulSoup
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_scraper():
+    """从仓库根目录导入爬虫模块；任务日志照常记录，控制台只输出警告和错误"""
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    import pdf_scraper
+    logging.basicConfig(level=logging.WARNING, format=pdf_scraper.log_format)
+    return pdf_scraper
+
+
+def build_listing_page(anchors, encoding):
+    """生成包含大量链接的中文列表页"""
+    rows = []
+    for i in range(anchors):
+        year = 2015 + i % 11
+        month = i % 12 + 1
+        if i % 3 == 0:
+            rows.append(f'<li><a href="/upload/{year}/{month:02d}/P0{i:06d}.pdf">'
+                        f'{year}年{month}月建设工程造价信息价（第{i}期）</a><span>{year}-{month:02d}-15</span></li>')
+        else:
+            rows.append(f'<li><a href="/xxgk/{year}/{month:02d}/t{year}{month:02d}_{i}.html">'
+                        f'关于发布{year}年{month}月{"朝阳区" if i % 2 else "海淀区"}工程造价信息的通知</a></li>')
+    charset = "gb2312" if encoding == "gbk" else "utf-8"
+    page = (f'<html><head><meta http-equiv="Content-Type" content="text/html; charset={charset}">'
+            f'<title>造价信息 - 信息价发布</title></head><body>'
+            f'<div class="nav">{"".join("<a href=/n%d.html>栏目%d</a>" % (i, i) for i in range(50))}</div>'
+            f'<ul class="list">{"".join(rows)}</ul></body></html>')
+    return page.encode(encoding, errors="ignore")
+
+
+def legacy_parse(content):
+    """旧路径: 依次尝试utf-8/gbk/gb2312解码，再构建完整的BeautifulSoup树"""
+    try:
+        html_content = content.decode('utf-8')
+    except UnicodeDecodeError:
+        try:
+            html_content = content.decode('gbk')
+        except UnicodeDecodeError:
+            html_content = content.decode('gb2312', errors='ignore')
+    soup = BeautifulSoup(html_content, 'html.parser')
+    title = soup.title.string if soup.title else ""
+    return title, [(a.get('href'), a.text.strip()) for a in soup.find_all('a')]
+
+
+def best_of(func, repeat):
+    """运行多次，返回最短耗时（秒）和最后一次的结果"""
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--anchors", type=int, default=5000, help="每个页面的链接数")
+    parser.add_argument("--repeat", type=int, default=5, help="每种路径的运行次数")
+    args = parser.parse_args()
+
+    scraper = load_scraper()
+    lxml_html = scraper.lxml_html
+
+    for encoding in ("gbk", "utf-8"):
+        content = build_listing_page(args.anchors, encoding)
+        content_type = "text/html"
+
+        def new_path():
+            charset = scraper.detect_charset(content_type, content)
+            return scraper.extract_links(content, charset)
+
+        legacy_time, legacy_result = best_of(lambda: legacy_parse(content), args.repeat)
+        print(f"[{encoding}] 页面大小 {len(content) / 1024:.0f} KB, 链接 {len(legacy_result[1])} 个")
+        print(f"  旧路径 (完整BeautifulSoup树): {legacy_time * 1000:8.1f} ms")
+
+        scraper.lxml_html = None
+        strainer_time, strainer_result = best_of(new_path, args.repeat)
+        print(f"  SoupStrainer:                 {strainer_time * 1000:8.1f} ms "
+              f"({legacy_time / strainer_time:.1f}x), 链接 {len(strainer_result[1])} 个")
+        scraper.lxml_html = lxml_html
+
+        if lxml_html is not None:
+            lxml_time, lxml_result = best_of(new_path, args.repeat)
+            print(f"  lxml:                         {lxml_time * 1000:8.1f} ms "
+                  f"({legacy_time / lxml_time:.1f}x), 链接 {len(lxml_result[1])} 个")
+        else:
+            print("  lxml: 未安装，跳过")
+
+
+if __name__ == "__main__":
+    main()
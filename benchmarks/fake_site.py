@@ -0,0 +1,247 @@
+"""本地模拟的造价信息网站，用于离线基准测试
+
+页面结构和真实的政府网站类似: 首页 -> 年份栏目页 -> 月份列表页 -> PDF。
+页面交替使用GBK和UTF-8编码，列表页包含大量无关链接；PDF的大小和
+每个请求的延迟可以配置。robots.txt 指向站点地图索引，每年一个gzip压缩的
+站点地图列出月份列表页，以及大量带日期的新闻文章（/art/年/月/日/，与真实网站一样
+没有标题）；首页声明的RSS订阅源列出最近一个月的PDF。所有内容由URL确定性地生成，多次运行结果一致。
+
+用法: python benchmarks/fake_site.py [--port 8000] [--years 2021-2025] ...
+启动后第一行输出网站地址。
+"""
+import argparse
+import gzip
+import hashlib
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+page_pattern = re.compile(r'^/(?:(\d{4})/(?:(\d{2})/)?)?(?:index\.html)?$')
+pdf_pattern = re.compile(r'^/(\d{4})/(\d{2})/P(\d+)\.pdf$')
+sitemap_pattern = re.compile(r'^/sitemap-(\d{4})\.xml\.gz$')
+article_pattern = re.compile(r'^/art/\d{4}/\d{1,2}/\d{1,2}/art_(\d+)\.html$')
+
+
+class SiteConfig:
+    """网站规模和响应特性"""
+
+    def __init__(self, first_year=2021, last_year=2025, months=12, pdfs_per_page=4,
+                 anchors=1000, pdf_size=256 * 1024, latency=0.0, pdf_latency=None):
+        self.first_year = first_year
+        self.last_year = last_year
+        self.months = months
+        self.pdfs_per_page = pdfs_per_page
+        self.anchors = anchors  # 每个月份列表页的链接总数（含PDF）
+        self.pdf_size = pdf_size
+        self.latency = latency  # 每个页面请求的延迟（秒）
+        self.pdf_latency = latency if pdf_latency is None else pdf_latency
+
+    @property
+    def years(self):
+        return range(self.first_year, self.last_year + 1)
+
+    def expected_pdfs(self, start_year=None, end_year=None):
+        """年份范围内应下载的PDF数"""
+        years = [y for y in self.years
+                 if (not start_year or y >= int(start_year)) and (not end_year or y <= int(end_year))]
+        return len(years) * self.months * self.pdfs_per_page
+
+
+def page_encoding(year):
+    """奇数年份的页面使用GBK，其他页面使用UTF-8"""
+    return "gbk" if year and year % 2 else "utf-8"
+
+
+def render_page(title, links, encoding, noise=0):
+    """生成列表页，noise为附加的无关链接数"""
+    charset = "gb2312" if encoding == "gbk" else "utf-8"
+    items = "".join(f'<li><a href="{href}">{text}</a></li>' for href, text in links)
+    extra = "".join(f'<li><a href="/xxgk/t{i}.html">关于做好第{i}批政务公开工作的通知</a>'
+                    f'<span>2024-01-{i % 28 + 1:02d}</span></li>' for i in range(noise))
+    nav = "".join(f'<a href="/n{i}.html">栏目{i}</a>' for i in range(30))
+    html = (f'<html><head><meta http-equiv="Content-Type" content="text/html; charset={charset}">'
+            f'<link rel="alternate" type="application/rss+xml" href="/rss.xml">'
+            f'<title>{title}</title></head><body><div class="nav">{nav}</div>'
+            f'<ul class="list">{items}{extra}</ul></body></html>')
+    return html.encode(encoding, errors="ignore")
+
+
+def build_page(config, year, month):
+    """根据路径中的年份和月份生成首页、年份页或月份列表页"""
+    if year is None:
+        links = [(f"/{y}/index.html", f"{y}年造价信息") for y in config.years]
+        return render_page("造价信息", links, "gbk", noise=50)
+    if month is None:
+        links = [(f"/{year}/{m:02d}/index.html", f"{year}年{m}月信息价") for m in range(1, config.months + 1)]
+        return render_page(f"{year}年造价信息", links, page_encoding(year), noise=50)
+    links = [(f"/{year}/{month:02d}/P{i:04d}.pdf", f"{year}年{month}月建设工程信息价（第{i}期）")
+             for i in range(1, config.pdfs_per_page + 1)]
+    return render_page(f"{year}年{month}月信息价", links, page_encoding(year),
+                       noise=max(config.anchors - len(links), 0))
+
+
+def build_sitemap_index(config, base):
+    entries = "".join(f"<sitemap><loc>{base}sitemap-{y}.xml.gz</loc></sitemap>" for y in config.years)
+    return (f'<?xml version="1.0" encoding="UTF-8"?>'
+            f'<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{entries}</sitemapindex>').encode()
+
+
+def build_sitemap(config, base, year):
+    """某一年的站点地图（gzip压缩）: 年份页和月份列表页，另有若干无关页面和每月10篇新闻文章"""
+    pages = [f"{year}/index.html"] + [f"{year}/{m:02d}/index.html" for m in range(1, config.months + 1)]
+    pages += [f"xxgk/t{i}.html" for i in range(20)]
+    pages += [f"art/{year}/{m}/{d}/art_{year}{m:02d}{d:02d}.html" for m in range(1, 13) for d in range(1, 29, 3)]
+    entries = "".join(f"<url><loc>{base}{page}</loc><lastmod>{year}-01-01</lastmod></url>" for page in pages)
+    return gzip.compress((f'<?xml version="1.0" encoding="UTF-8"?>'
+                          f'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{entries}</urlset>').encode())
+
+
+def build_rss(config, base):
+    """RSS订阅源: 最近一个月的PDF"""
+    year, month = config.last_year, config.months
+    items = "".join(f"<item><title>{year}年{month}月建设工程信息价（第{i}期）</title>"
+                    f"<link>{base}{year}/{month:02d}/P{i:04d}.pdf</link></item>"
+                    for i in range(1, config.pdfs_per_page + 1))
+    return (f'<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel>'
+            f'<title>造价信息</title>{items}</channel></rss>').encode()
+
+
+def pdf_body(path, size):
+    """PDF内容: 有文件头、页面对象、文档信息和%%EOF结尾，各文件内容不同（避免被去重合并）"""
+    year, month, number = pdf_pattern.match(path).groups()
+    title = f"{year}年{int(month)}月建设工程信息价（第{int(number)}期）".encode("utf-16-be")
+    pages = max(1, min(size // (64 * 1024), 50))
+    objects = [b"1 0 obj\n<< /Type /Catalog /Pages 2 0 R >>\nendobj\n",
+               b"2 0 obj\n<< /Type /Pages /Count %d >>\nendobj\n" % pages,
+               b"3 0 obj\n<< /Title <FEFF%s> /CreationDate (D:%s%s15093000+08'00') >>\nendobj\n"
+               % (title.hex().upper().encode(), year.encode(), month.encode())]
+    objects += [b"%d 0 obj\n<< /Type /Page /Parent 2 0 R >>\nendobj\n" % (4 + i) for i in range(pages)]
+    header = b"%PDF-1.4\n% " + hashlib.sha256(path.encode()).hexdigest().encode() + b"\n" + b"".join(objects)
+    trailer = b"trailer\n<< /Root 1 0 R /Info 3 0 R >>\n%%EOF\n"
+    padding_length = max(size - len(header) - len(trailer), 0)
+    padding = (b"0123456789abcdef" * (padding_length // 16 + 1))[:padding_length]
+    return header + padding + trailer
+
+
+def make_handler(config):
+    pdf_cache = {}
+    cache_lock = threading.Lock()
+
+    class FakeSiteHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # 支持连接复用
+
+        def log_message(self, format, *args):
+            pass
+
+        def send_body(self, status, content_type, body, etag=None):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            if etag:
+                self.send_header("ETag", etag)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            path = self.path.split("?", 1)[0]
+            match = pdf_pattern.match(path)
+            if match:
+                time.sleep(config.pdf_latency)
+                etag = '"%s"' % hashlib.md5(path.encode()).hexdigest()
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                with cache_lock:
+                    body = pdf_cache.get(path)
+                    if body is None:
+                        body = pdf_cache[path] = pdf_body(path, config.pdf_size)
+                self.send_body(200, "application/pdf", body, etag)
+                return
+            base = f"http://{self.headers.get('Host')}/"
+            match = sitemap_pattern.match(path)
+            if path == "/robots.txt":
+                self.send_body(200, "text/plain", f"User-agent: *\nSitemap: {base}sitemap_index.xml\n".encode())
+                return
+            if path == "/sitemap_index.xml":
+                self.send_body(200, "application/xml", build_sitemap_index(config, base))
+                return
+            if match and int(match.group(1)) in config.years:
+                self.send_body(200, "application/x-gzip", build_sitemap(config, base, int(match.group(1))))
+                return
+            if path == "/rss.xml":
+                self.send_body(200, "application/rss+xml", build_rss(config, base))
+                return
+            if article_pattern.match(path):
+                time.sleep(config.latency)
+                self.send_body(200, "text/html", render_page("关于做好政务公开工作的通知", [], "utf-8"))
+                return
+            match = page_pattern.match(path)
+            if match:
+                time.sleep(config.latency)
+                year = int(match.group(1)) if match.group(1) else None
+                month = int(match.group(2)) if match.group(2) else None
+                if (year is None or year in config.years) and (month is None or 1 <= month <= config.months):
+                    etag = '"%s"' % hashlib.md5(path.encode()).hexdigest()
+                    if self.headers.get("If-None-Match") == etag:
+                        self.send_response(304)
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                        return
+                    # 不在响应头中声明编码，由爬虫根据<meta>判断
+                    self.send_body(200, "text/html", build_page(config, year, month), etag)
+                    return
+            self.send_body(404, "text/html", b"<html><body>404</body></html>")
+
+    return FakeSiteHandler
+
+
+def start_server(config, host="127.0.0.1", port=0):
+    """在后台线程中启动网站，返回 (server, 网站地址)"""
+    server = ThreadingHTTPServer((host, port), make_handler(config))
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}/"
+
+
+def add_site_arguments(parser):
+    parser.add_argument("--years", default="2021-2025", help="网站包含的年份范围，如 2021-2025")
+    parser.add_argument("--months", type=int, default=12, help="每年的月份页数")
+    parser.add_argument("--pdfs-per-page", type=int, default=4, help="每个月份页的PDF数")
+    parser.add_argument("--anchors", type=int, default=1000, help="每个月份页的链接总数")
+    parser.add_argument("--pdf-kb", type=int, default=256, help="每个PDF的大小（KB）")
+    parser.add_argument("--latency-ms", type=float, default=0, help="每个页面请求的延迟（毫秒）")
+    parser.add_argument("--pdf-latency-ms", type=float, default=None, help="每个PDF请求的延迟（毫秒），默认同页面")
+
+
+def config_from_args(args):
+    first_year, _, last_year = args.years.partition("-")
+    return SiteConfig(first_year=int(first_year), last_year=int(last_year or first_year),
+                      months=args.months, pdfs_per_page=args.pdfs_per_page, anchors=args.anchors,
+                      pdf_size=args.pdf_kb * 1024, latency=args.latency_ms / 1000,
+                      pdf_latency=None if args.pdf_latency_ms is None else args.pdf_latency_ms / 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=0, help="监听端口，0表示随机端口")
+    add_site_arguments(parser)
+    args = parser.parse_args()
+
+    server, url = start_server(config_from_args(args), args.host, args.port)
+    print(url, flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
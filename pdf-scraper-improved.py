@@ -1,26 +1,35 @@
+"""造价信息PDF爬虫的Web界面
+
+爬取逻辑在 pdf_scraper 模块中；不需要Web界面时（如定时任务）直接运行
+python pdf_scraper.py crawl ...
+"""
 import os
-import re
-import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin, urlparse
-import logging
-from flask import Flask, render_template_string, request, jsonify, send_from_directory
-import threading
+import sys
+import argparse
 import time
+import json
+import logging
 import datetime
+import collections
+from flask import Flask, Response, render_template_string, request, jsonify, send_from_directory
 
-# 配置日志 - 增加详细程度
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-logger = logging.getLogger(__name__)
+import pdf_scraper
+from pdf_scraper import (
+    CrawlJob, DownloadCatalog, configure_logging, debug_events, get_catalog, job_manager, metrics,
+    new_progress, parse_int_param, parse_log_level, parse_size,
+    default_backoff_factor, default_bandwidth_limit, default_byte_budget, default_chunk_size,
+    default_discovery_workers, default_download_folder, default_download_workers, default_host_rate,
+    default_max_pages, default_min_free_space, default_per_host_limit, default_retries,
+    max_chunk_size, max_debug_entries, max_download_workers, max_shard_processes,
+)
 
 app = Flask(__name__)
 
-# 全局变量
-default_download_folder = "downloads"
-last_run_time = None
-running = False
-debug_info = []  # 用于存储调试信息
-progress = {"total": 0, "current": 0, "filename": "", "percentage": 0}  # 添加进度信息
+# 文件列表和事件流
+default_files_per_page = 50  # 文件列表每页条数
+max_files_per_page = 500
+event_poll_interval = 1.0  # 事件流检查进度变化的间隔（秒）
+event_keepalive_interval = 15.0  # 没有新事件时发送心跳的间隔（秒）
 
 # HTML模板 (修改后)
 html_template = """
@@ -65,7 +74,7 @@ html_template = """
             background-color: #cccccc;
             cursor: not-allowed;
         }
-        input[type="text"], input[type="number"], select {
+        input[type="text"], input[type="number"], select, textarea {
             width: 100%;
             padding: 8px;
             margin: 6px 0;
@@ -141,6 +150,10 @@ html_template = """
             margin: 5px 0;
             font-size: 14px;
         }
+        .pagination {
+            margin-top: 10px;
+            text-align: center;
+        }
     </style>
 </head>
 <body>
@@ -149,7 +162,7 @@ html_template = """
         
         <div id="status" class="status">
             {% if running %}
-                <div class="running">爬虫正在运行中...</div>
+                <div class="running">{{ running }} 个爬虫任务正在运行{% if pending %}，{{ pending }} 个排队中{% endif %}...</div>
             {% elif last_run %}
                 <div class="success">上次运行时间: {{ last_run }}</div>
             {% else %}
@@ -160,7 +173,7 @@ html_template = """
         <form id="crawlForm">
             <div class="form-group">
                 <label for="baseUrl">抓取网站:</label>
-                <input type="text" id="baseUrl" name="baseUrl" placeholder="输入要抓取的网站URL" required>
+                <textarea id="baseUrl" name="baseUrl" rows="2" placeholder="输入要抓取的网站URL，多个网站每行一个（分给多个进程同时爬取）" required></textarea>
             </div>
             
             <div class="form-group">
@@ -182,7 +195,84 @@ html_template = """
                 </div>
             </div>
             
-            <button type="button" id="startBtn" onclick="startCrawl()" {% if running %}disabled{% endif %}>
+            <div class="form-group">
+                <label>并发设置:</label>
+                <div style="display: flex; gap: 10px;">
+                    <div style="flex: 1;">
+                        <label for="workers">下载线程数:</label>
+                        <input type="number" id="workers" name="workers" min="1" max="{{ max_workers }}" value="{{ default_workers }}">
+                    </div>
+                    <div style="flex: 1;">
+                        <label for="perHost">单站点并发上限:</label>
+                        <input type="number" id="perHost" name="perHost" min="1" max="{{ max_workers }}" value="{{ default_per_host }}">
+                    </div>
+                    <div style="flex: 1;">
+                        <label for="discoveryWorkers">页面抓取线程数:</label>
+                        <input type="number" id="discoveryWorkers" name="discoveryWorkers" min="1" max="{{ max_workers }}" value="{{ default_discovery_workers }}">
+                    </div>
+                    <div style="flex: 1;">
+                        <label for="hostRate">单站点每秒请求数 (0为不限):</label>
+                        <input type="number" id="hostRate" name="hostRate" min="0" step="0.5" value="{{ default_host_rate }}">
+                    </div>
+                    <div style="flex: 1;">
+                        <label for="maxPages">页面数上限 (0为不限):</label>
+                        <input type="number" id="maxPages" name="maxPages" min="0" value="{{ default_max_pages }}">
+                    </div>
+                    <div style="flex: 1;">
+                        <label for="processes">进程数 (多个网站时):</label>
+                        <input type="number" id="processes" name="processes" min="1" max="{{ max_processes }}" value="{{ default_processes }}">
+                    </div>
+                </div>
+            </div>
+            
+            <div class="form-group">
+                <label>传输限制 (字节数可带K/M/G后缀，留空或0为不限):</label>
+                <div style="display: flex; gap: 10px;">
+                    <div style="flex: 1;">
+                        <label for="bandwidth">下载带宽上限 (每秒):</label>
+                        <input type="text" id="bandwidth" name="bandwidth" placeholder="如 2M">
+                    </div>
+                    <div style="flex: 1;">
+                        <label for="maxBytes">下载字节预算:</label>
+                        <input type="text" id="maxBytes" name="maxBytes" placeholder="如 500M">
+                    </div>
+                    <div style="flex: 1;">
+                        <label for="minFreeSpace">磁盘至少保留空间:</label>
+                        <input type="text" id="minFreeSpace" name="minFreeSpace" value="{{ default_min_free_space }}">
+                    </div>
+                </div>
+            </div>
+            
+            <div class="form-group">
+                <label>
+                    <input type="checkbox" id="incremental" name="incremental" checked>
+                    增量模式（跳过未变化的文件）
+                </label>
+                <label>
+                    <input type="checkbox" id="resume" name="resume">
+                    从上次中断处继续（已抓取的页面和已下载的文件不再重复）
+                </label>
+                <label>
+                    <input type="checkbox" id="respectRobots" name="respectRobots">
+                    遵守robots.txt的抓取间隔
+                </label>
+                <label>
+                    <input type="checkbox" id="pageCache" name="pageCache">
+                    缓存列表页（再次爬取时跳过未变化的页面）
+                </label>
+                <label>
+                    <input type="checkbox" id="sitemaps" name="sitemaps">
+                    优先使用站点地图和RSS（找到时只浅层遍历网页）
+                </label>
+                <label for="logLevel">日志级别:</label>
+                <select id="logLevel" name="logLevel">
+                    <option value="DEBUG">详细 (DEBUG)</option>
+                    <option value="INFO" selected>一般 (INFO)</option>
+                    <option value="WARNING">仅警告和错误 (WARNING)</option>
+                </select>
+            </div>
+            
+            <button type="button" id="startBtn" onclick="startCrawl()">
                 开始爬取
             </button>
         </form>
@@ -200,25 +290,34 @@ html_template = """
             </div>
         </div>
         
-        <h2>已下载文件 (<span id="fileCount">{{ files|length }}</span>)</h2>
+        <h2>已下载文件 (<span id="fileCount">{{ file_total }}</span>)</h2>
         <table>
             <thead>
                 <tr>
-                    <th>文件名</th>
-                    <th>下载时间</th>
+                    <th><a href="?sort=name&order={{ 'desc' if sort == 'name' and order == 'asc' else 'asc' }}&per_page={{ per_page }}">文件名</a></th>
+                    <th><a href="?sort=size&order={{ 'asc' if sort == 'size' and order == 'desc' else 'desc' }}&per_page={{ per_page }}">大小</a></th>
+                    <th><a href="?sort=mtime&order={{ 'asc' if sort == 'mtime' and order == 'desc' else 'desc' }}&per_page={{ per_page }}">下载时间</a></th>
                     <th>操作</th>
                 </tr>
             </thead>
             <tbody id="fileList">
                 {% for file in files %}
                 <tr>
-                    <td>{{ file }}</td>
-                    <td>{{ last_modified(file) }}</td>
-                    <td><a href="/downloads/{{ file }}" download>下载</a></td>
+                    <td>{{ file.name }}</td>
+                    <td>{{ (file.size / 1048576)|round(2) }} MB</td>
+                    <td>{{ file.modified }}</td>
+                    <td><a href="/downloads/{{ file.name }}" download>下载</a></td>
                 </tr>
                 {% endfor %}
             </tbody>
         </table>
+        {% if pages > 1 %}
+        <div class="pagination">
+            {% if page > 1 %}<a href="?page={{ page - 1 }}&sort={{ sort }}&order={{ order }}&per_page={{ per_page }}">上一页</a>{% endif %}
+            第 {{ page }} / {{ pages }} 页
+            {% if page < pages %}<a href="?page={{ page + 1 }}&sort={{ sort }}&order={{ order }}&per_page={{ per_page }}">下一页</a>{% endif %}
+        </div>
+        {% endif %}
         
         <div class="debug-info">
             <h3>调试信息</h3>
@@ -232,10 +331,25 @@ html_template = """
 
     <script>
         function startCrawl() {
-            const baseUrl = document.getElementById('baseUrl').value;
+            const baseUrl = document.getElementById('baseUrl').value.trim();
             const downloadPath = document.getElementById('downloadPath').value;
             const startYear = document.getElementById('startYear').value;
             const endYear = document.getElementById('endYear').value;
+            const workers = document.getElementById('workers').value;
+            const perHost = document.getElementById('perHost').value;
+            const discoveryWorkers = document.getElementById('discoveryWorkers').value;
+            const incremental = document.getElementById('incremental').checked;
+            const hostRate = document.getElementById('hostRate').value;
+            const respectRobots = document.getElementById('respectRobots').checked;
+            const logLevel = document.getElementById('logLevel').value;
+            const pageCache = document.getElementById('pageCache').checked;
+            const sitemaps = document.getElementById('sitemaps').checked;
+            const processes = document.getElementById('processes').value;
+            const resume = document.getElementById('resume').checked;
+            const maxPages = document.getElementById('maxPages').value;
+            const bandwidth = document.getElementById('bandwidth').value;
+            const maxBytes = document.getElementById('maxBytes').value;
+            const minFreeSpace = document.getElementById('minFreeSpace').value;
             
             if (!baseUrl) {
                 alert('请输入要抓取的网站URL');
@@ -249,6 +363,7 @@ html_template = """
             document.getElementById('progressBar').textContent = '0%';
             document.getElementById('progressFile').textContent = '准备中...';
             document.getElementById('progressCount').textContent = '0 / 0';
+            document.getElementById('debugItems').innerHTML = '';
             
             fetch('/start_crawl', {
                 method: 'POST',
@@ -259,14 +374,35 @@ html_template = """
                     baseUrl: baseUrl,
                     downloadPath: downloadPath,
                     startYear: startYear,
-                    endYear: endYear
+                    endYear: endYear,
+                    workers: workers,
+                    perHost: perHost,
+                    incremental: incremental,
+                    discoveryWorkers: discoveryWorkers,
+                    hostRate: hostRate,
+                    respectRobots: respectRobots,
+                    logLevel: logLevel,
+                    pageCache: pageCache,
+                    sitemaps: sitemaps,
+                    processes: processes,
+                    resume: resume,
+                    maxPages: maxPages,
+                    bandwidth: bandwidth,
+                    maxBytes: maxBytes,
+                    minFreeSpace: minFreeSpace
                 })
             })
             .then(response => response.json())
             .then(data => {
                 console.log(data);
-                // 开始定期检查状态和进度
-                checkStatusAndProgress();
+                if (data.status !== 'success') {
+                    alert(data.message);
+                    document.getElementById('startBtn').disabled = false;
+                    return;
+                }
+                document.getElementById('status').innerHTML = '<div class="running">' + data.message + '</div>';
+                // 订阅本任务的进度和调试信息
+                watchJob(data.job_id);
             })
             .catch(error => {
                 console.error('Error:', error);
@@ -274,46 +410,74 @@ html_template = """
             });
         }
         
-        function checkStatusAndProgress() {
-            fetch('/status')
+        function renderProgress(progress) {
+            const progressBar = document.getElementById('progressBar');
+            progressBar.style.width = progress.percentage + '%';
+            progressBar.textContent = progress.percentage + '%';
+            
+            document.getElementById('progressFile').textContent = 
+                progress.filename ? '当前下载: ' + progress.filename : '准备中...';
+            
+            document.getElementById('progressCount').textContent = 
+                progress.current + ' / ' + progress.total +
+                (progress.discovering ? '（仍在查找链接）' : '');
+        }
+        
+        function appendDebugItems(messages) {
+            const debugItems = document.getElementById('debugItems');
+            for (const message of messages) {
+                const div = document.createElement('div');
+                div.className = 'debug-item';
+                div.textContent = message;
+                debugItems.appendChild(div);
+            }
+            // 滚动到底部
+            const debugInfo = document.querySelector('.debug-info');
+            debugInfo.scrollTop = debugInfo.scrollHeight;
+        }
+        
+        function watchJob(jobId) {
+            // 浏览器不支持事件流时退回到定期查询
+            if (!window.EventSource) {
+                checkStatusAndProgress(jobId);
+                return;
+            }
+            const progress = {percentage: 0, current: 0, total: 0, filename: '', discovering: true};
+            const source = new EventSource('/jobs/' + jobId + '/events');
+            source.addEventListener('progress', event => {
+                // 服务器只发送变化的字段
+                Object.assign(progress, JSON.parse(event.data));
+                renderProgress(progress);
+            });
+            source.addEventListener('log', event => {
+                appendDebugItems([JSON.parse(event.data).message]);
+            });
+            source.addEventListener('end', () => {
+                source.close();
+                window.location.reload();
+            });
+        }
+        
+        function checkStatusAndProgress(jobId) {
+            fetch('/jobs/' + jobId)
             .then(response => response.json())
             .then(data => {
                 // 更新进度条
                 if (data.progress) {
-                    const progressBar = document.getElementById('progressBar');
-                    progressBar.style.width = data.progress.percentage + '%';
-                    progressBar.textContent = data.progress.percentage + '%';
-                    
-                    document.getElementById('progressFile').textContent = 
-                        data.progress.filename ? '当前下载: ' + data.progress.filename : '准备中...';
-                    
-                    document.getElementById('progressCount').textContent = 
-                        data.progress.current + ' / ' + data.progress.total;
+                    renderProgress(data.progress);
                 }
                 
-                // 更新调试信息
-                if (data.debug_info && data.debug_info.length > 0) {
-                    const debugItems = document.getElementById('debugItems');
-                    // 只添加新的调试信息
-                    const currentItems = debugItems.querySelectorAll('.debug-item');
-                    const currentCount = currentItems.length;
-                    
+                // 只添加新的调试信息
+                if (data.debug_info) {
+                    const currentCount = document.querySelectorAll('#debugItems .debug-item').length;
                     if (data.debug_info.length > currentCount) {
-                        for (let i = currentCount; i < data.debug_info.length; i++) {
-                            const div = document.createElement('div');
-                            div.className = 'debug-item';
-                            div.textContent = data.debug_info[i];
-                            debugItems.appendChild(div);
-                        }
-                        // 滚动到底部
-                        const debugInfo = document.querySelector('.debug-info');
-                        debugInfo.scrollTop = debugInfo.scrollHeight;
+                        appendDebugItems(data.debug_info.slice(currentCount));
                     }
                 }
                 
                 if (data.running) {
                     // 如果仍在运行，继续检查
-                    setTimeout(checkStatusAndProgress, 1000);
+                    setTimeout(() => checkStatusAndProgress(jobId), 1000);
                 } else {
                     // 如果已完成，刷新页面
                     window.location.reload();
@@ -321,7 +485,7 @@ html_template = """
             })
             .catch(error => {
                 console.error('Error:', error);
-                setTimeout(checkStatusAndProgress, 2000);
+                setTimeout(() => checkStatusAndProgress(jobId), 2000);
             });
         }
     </script>
@@ -329,378 +493,250 @@ html_template = """
 </html>
 """
 
-# 确保下载目录存在
-if not os.path.exists(default_download_folder):
-    os.makedirs(default_download_folder)
-
-def add_debug_info(message):
-    """添加调试信息"""
-    global debug_info
-    debug_info.append(message)
-    if len(debug_info) > 100:  # 增加限制条目数
-        debug_info = debug_info[-100:]
-    logger.debug(message)
-
-def extract_year_from_text(text):
-    """从文本中提取年份"""
-    # 匹配四位数年份，如"2025年"或"2025-"
-    year_match = re.search(r'(20\d{2})[年\-]', text)
-    if year_match:
-        return year_match.group(1)
-    return None
-
-def extract_month_from_text(text):
-    """从文本中提取月份"""
-    # 匹配月份，如"3月"或"03"
-    month_match = re.search(r'(\d{1,2})[月\-]', text)
-    if month_match:
-        return month_match.group(1).zfill(2)  # 补齐成两位数
-    return None
+def parse_listing_args():
+    """解析文件列表的分页和排序参数"""
+    page = parse_int_param(request.args.get('page'), 1, upper=sys.maxsize)
+    per_page = parse_int_param(request.args.get('per_page'), default_files_per_page, upper=max_files_per_page)
+    sort = request.args.get('sort', 'mtime')
+    if sort not in DownloadCatalog.sort_keys:
+        sort = 'mtime'
+    descending = request.args.get('order', 'desc') != 'asc'
+    return page, per_page, sort, descending
 
-def extract_name_from_text(text):
-    """从文本中提取有意义的名称"""
-    # 尝试匹配"信息价"、"造价信息"等关键词
-    name_match = re.search(r'(造价[信息]*|信息价|定额|指数|参考价|市场价|建设工程)', text)
-    if name_match:
-        return name_match.group(1)
-    return None
-
-def generate_file_name(url, original_name):
-    """根据URL和原始文件名生成新的文件名"""
-    # 从URL的路径部分提取文本
-    path = urlparse(url).path
-    path_text = path.replace('/', ' ').strip()
-    
-    # 从URL和文件名中提取年份和月份
-    year = extract_year_from_text(path_text) or extract_year_from_text(original_name)
-    month = extract_month_from_text(path_text) or extract_month_from_text(original_name)
-    name_part = extract_name_from_text(path_text) or extract_name_from_text(original_name) or "信息价"
-    
-    # 构建新文件名
-    if year and month:
-        new_name = f"{year}年{month}月{name_part}.pdf"
-    elif year:
-        new_name = f"{year}年{name_part}.pdf"
-    else:
-        # 如果无法提取时间信息，使用原始文件名
-        new_name = original_name
-        
-    return new_name
-
-def is_in_year_range(url, text, start_year, end_year):
-    """检查URL或文本中的年份是否在指定范围内"""
-    if not start_year or not end_year:
-        return True  # 如果未指定范围，默认包含所有
-
-    # 从URL和文本中提取年份
-    year_text = url + " " + text
-    year_match = re.search(r'(20\d{2})', year_text)
-    
-    if year_match:
-        year = int(year_match.group(1))
-        return int(start_year) <= year <= int(end_year)
-    
-    # 如果无法提取年份，默认包含
-    return True
-
-def download_pdf(url, folder, update_progress=None):
-    """下载PDF文件并保存到指定文件夹"""
+def parse_size_param(value, default):
+    """解析表单中的字节数（可带K/M/G后缀），留空或无效时使用默认值"""
+    if value in (None, ''):
+        return default
     try:
-        add_debug_info(f"尝试下载: {url}")
-        
-        # 发送请求获取PDF内容
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Accept': 'application/pdf,*/*',
-            'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
-            'Connection': 'keep-alive'
-        }
-        
-        response = requests.get(url, stream=True, headers=headers, timeout=30)
-        
-        # 检查是否为PDF
-        content_type = response.headers.get('Content-Type', '')
-        add_debug_info(f"Content-Type: {content_type}")
-        
-        if response.status_code == 200:
-            # 从URL中提取文件名
-            original_file_name = url.split('/')[-1]
-            
-            # 确保文件名以.pdf结尾
-            if not original_file_name.lower().endswith('.pdf'):
-                if 'application/pdf' in content_type:
-                    original_file_name += '.pdf'
-                else:
-                    add_debug_info(f"忽略非PDF文件: {url}")
-                    if update_progress:
-                        update_progress(skipped=True)
-                    return None
-            
-            # 生成新文件名
-            file_name = generate_file_name(url, original_file_name)
-            add_debug_info(f"文件将被保存为: {file_name}")
-            
-            file_path = os.path.join(folder, file_name)
-            
-            # 检查内容长度
-            content_length = int(response.headers.get('Content-Length', 0))
-            add_debug_info(f"内容长度: {content_length} 字节")
-            
-            if content_length < 1000:  # 如果文件太小，可能不是有效的PDF
-                add_debug_info(f"文件太小，可能不是有效的PDF: {content_length} 字节")
-                
-                # 检查内容的前几个字节是否是PDF标识
-                first_bytes = next(response.iter_content(chunk_size=10), b'')
-                if not first_bytes.startswith(b'%PDF'):
-                    add_debug_info(f"内容不是以PDF标识开头")
-                    if update_progress:
-                        update_progress(skipped=True)
-                    return None
-            
-            # 保存文件
-            with open(file_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
-            
-            add_debug_info(f"成功下载: {file_name}")
-            if update_progress:
-                update_progress(success=True, filename=file_name)
-            return file_name
-        else:
-            add_debug_info(f"下载失败, 状态码: {response.status_code}, URL: {url}")
-            if update_progress:
-                update_progress(skipped=True)
-            return None
-    except Exception as e:
-        add_debug_info(f"下载过程中出错: {str(e)}, URL: {url}")
-        if update_progress:
-            update_progress(skipped=True)
-        return None
-
-def get_pdf_links(url, start_year=None, end_year=None, depth=0, max_depth=3, visited=None):
-    """获取页面上的PDF链接，支持递归和循环检测"""
-    if visited is None:
-        visited = set()
-    
-    if url in visited or depth > max_depth:
-        return []
-    
-    visited.add(url)
-    add_debug_info(f"正在检查页面 (深度 {depth}): {url}")
-    
-    try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8'
-        }
-        
-        response = requests.get(url, headers=headers, timeout=30)
-        add_debug_info(f"HTTP状态码: {response.status_code}")
-        
-        if response.status_code == 200:
-            # 尝试检测编码
-            if 'content-type' in response.headers:
-                content_type = response.headers['content-type']
-                add_debug_info(f"Content-Type: {content_type}")
-                
-                # 尝试解析为不同的编码
-                try:
-                    html_content = response.content.decode('utf-8')
-                except UnicodeDecodeError:
-                    try:
-                        html_content = response.content.decode('gbk')
-                    except UnicodeDecodeError:
-                        html_content = response.content.decode('gb2312', errors='ignore')
-            else:
-                html_content = response.text
-            
-            soup = BeautifulSoup(html_content, 'html.parser')
-            
-            # 提取页面标题
-            title = soup.title.string if soup.title else "无标题"
-            add_debug_info(f"页面标题: {title}")
-            
-            # 查找所有链接
-            links = soup.find_all('a')
-            add_debug_info(f"找到链接数量: {len(links)}")
-            
-            pdf_links = []
-            potential_subpages = []
-            
-            # 优先搜索直接的PDF链接
-            for link in links:
-                href = link.get('href')
-                if not href:
-                    continue
-                
-                # 转为完整URL
-                full_url = urljoin(url, href)
-                
-                # 获取链接文本
-                link_text = link.text.strip() if link.text else ""
-                
-                # 检查链接是否以.pdf结尾
-                if href.lower().endswith('.pdf'):
-                    # 检查是否在年份范围内
-                    if is_in_year_range(full_url, link_text, start_year, end_year):
-                        add_debug_info(f"找到PDF链接: {full_url}")
-                        pdf_links.append(full_url)
-                    else:
-                        add_debug_info(f"PDF链接不在指定年份范围内，已忽略: {full_url}")
-                
-                # 收集可能包含PDF的页面链接
-                if ('造价信息' in link_text or '造价' in link_text or '信息价' in link_text 
-                    or '建设工程' in link_text or '定额' in link_text):
-                    potential_subpages.append((full_url, link_text))
-                    add_debug_info(f"找到潜在内容页面: {link_text} -> {full_url}")
-            
-            # 如果没有直接找到PDF但有潜在子页面，递归检查
-            if potential_subpages and depth < max_depth:
-                for subpage_url, subpage_text in potential_subpages:
-                    if subpage_url not in visited:
-                        add_debug_info(f"递归检查: {subpage_text} -> {subpage_url}")
-                        sub_pdf_links = get_pdf_links(subpage_url, start_year, end_year, depth + 1, max_depth, visited)
-                        pdf_links.extend(sub_pdf_links)
-            
-            return pdf_links
-        else:
-            add_debug_info(f"获取页面失败, 状态码: {response.status_code}, URL: {url}")
-            return []
-    except Exception as e:
-        add_debug_info(f"获取PDF链接过程中出错: {str(e)}, URL: {url}")
-        return []
-
-def crawl_pdfs(base_url, download_folder, start_year=None, end_year=None):
-    """爬取网站上的所有PDF"""
-    global running, last_run_time, debug_info, progress
-    running = True
-    debug_info = []  # 重置调试信息
-    progress = {"total": 0, "current": 0, "filename": "", "percentage": 0}  # 重置进度
-    
-    try:
-        add_debug_info(f"开始爬取PDF，网站: {base_url}")
-        add_debug_info(f"下载路径: {download_folder}")
-        add_debug_info(f"年份范围: {start_year} - {end_year}")
-        
-        # 确保下载目录存在
-        if not os.path.exists(download_folder):
-            os.makedirs(download_folder)
-            add_debug_info(f"创建下载目录: {download_folder}")
-        
-        # 获取所有PDF链接
-        pdf_links = get_pdf_links(base_url, start_year, end_year)
-        add_debug_info(f"找到 {len(pdf_links)} 个PDF链接")
-        
-        # 设置进度信息
-        progress["total"] = len(pdf_links)
-        progress["current"] = 0
-        
-        # 打印所有找到的链接
-        for i, link in enumerate(pdf_links):
-            add_debug_info(f"链接 {i+1}: {link}")
-        
-        # 定义进度更新函数
-        def update_progress(success=False, skipped=False, filename=""):
-            global progress
-            if success or skipped:
-                progress["current"] += 1
-            
-            if success and filename:
-                progress["filename"] = filename
-            
-            if progress["total"] > 0:
-                progress["percentage"] = int((progress["current"] / progress["total"]) * 100)
-            else:
-                progress["percentage"] = 100
-        
-        # 下载所有PDF
-        downloaded_files = []
-        for link in pdf_links:
-            progress["filename"] = link.split('/')[-1]  # 设置当前正在下载的文件名
-            filename = download_pdf(link, download_folder, update_progress)
-            if filename:
-                downloaded_files.append(filename)
-        
-        add_debug_info(f"爬取完成，成功下载 {len(downloaded_files)} 个文件")
-        last_run_time = time.strftime("%Y-%m-%d %H:%M:%S")
-        
-        progress["filename"] = "完成"
-        progress["percentage"] = 100
-        
-        return downloaded_files
-    except Exception as e:
-        add_debug_info(f"爬取过程中出错: {str(e)}")
-        return []
-    finally:
-        running = False
-
-# 获取文件的最后修改时间
-def get_last_modified(filename):
-    file_path = os.path.join(default_download_folder, filename)
-    if os.path.exists(file_path):
-        return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(os.path.getmtime(file_path)))
-    return "未知"
+        return parse_size(str(value))
+    except argparse.ArgumentTypeError:
+        return default
 
 # Web服务路由
 @app.route('/')
 def index():
     """网站首页"""
-    # 获取下载目录中的文件列表
-    files = os.listdir(default_download_folder) if os.path.exists(default_download_folder) else []
-    # 按修改时间排序文件
-    files.sort(key=lambda x: os.path.getmtime(os.path.join(default_download_folder, x)), reverse=True)
+    # 从文件索引中取当前页，按修改时间倒序
+    page, per_page, sort, descending = parse_listing_args()
+    total, files = get_catalog(default_download_folder).page(page, per_page, sort, descending)
     
     # 获取当前年份
     current_year = datetime.datetime.now().year
     
+    latest_job = job_manager.latest()
+    
     return render_template_string(html_template, 
                                 files=files, 
-                                last_run=last_run_time, 
-                                running=running,
-                                debug_info=debug_info,
-                                last_modified=get_last_modified,
+                                file_total=total,
+                                page=page,
+                                pages=max((total + per_page - 1) // per_page, 1),
+                                per_page=per_page,
+                                sort=sort,
+                                order="desc" if descending else "asc",
+                                last_run=pdf_scraper.last_run_time, 
+                                running=job_manager.running_count(),
+                                pending=job_manager.pending_count(),
+                                debug_info=latest_job.log_entries() if latest_job else debug_events.messages(),
                                 default_path=default_download_folder,
-                                current_year=current_year)
+                                current_year=current_year,
+                                default_workers=default_download_workers,
+                                default_per_host=default_per_host_limit,
+                                default_discovery_workers=default_discovery_workers,
+                                default_host_rate=default_host_rate,
+                                max_workers=max_download_workers,
+                                default_processes=min(os.cpu_count() or 1, max_shard_processes),
+                                max_processes=max_shard_processes,
+                                default_max_pages=default_max_pages,
+                                default_min_free_space=f"{default_min_free_space // (1024 * 1024)}M")
 
 @app.route('/start_crawl', methods=['POST'])
 def start_crawl():
-    """启动爬虫"""
-    global running
-    if running:
-        return jsonify({"status": "error", "message": "爬虫正在运行中"})
-    
+    """创建爬取任务，超过同时运行上限时排队等待"""
     # 获取参数
     data = request.json
-    base_url = data.get('baseUrl', '')
+    base_urls = data.get('baseUrl') or ''
+    # 多个网站可以传列表，或用空白、换行分隔
+    base_urls = [str(url) for url in base_urls] if isinstance(base_urls, list) else str(base_urls).split()
     download_path = data.get('downloadPath', default_download_folder)
     start_year = data.get('startYear', '')
     end_year = data.get('endYear', '')
     
-    if not base_url:
+    workers = parse_int_param(data.get('workers'), default_download_workers)
+    per_host_limit = parse_int_param(data.get('perHost'), default_per_host_limit)
+    discovery_workers = parse_int_param(data.get('discoveryWorkers'), default_discovery_workers)
+    retries = parse_int_param(data.get('retries'), default_retries, lower=0, upper=10)
+    incremental = bool(data.get('incremental', False))
+    chunk_size = parse_int_param(data.get('chunkSize'), default_chunk_size, lower=1024, upper=max_chunk_size)
+    try:
+        host_rate = max(float(data.get('hostRate', default_host_rate)), 0.0)
+    except (TypeError, ValueError):
+        host_rate = default_host_rate
+    respect_robots = bool(data.get('respectRobots', False))
+    pdf_metadata = bool(data.get('pdfMetadata', True))
+    page_cache = bool(data.get('pageCache', False))
+    sitemaps = bool(data.get('sitemaps', False))
+    resume = bool(data.get('resume', False))
+    max_pages = parse_int_param(data.get('maxPages'), default_max_pages, lower=0, upper=sys.maxsize)
+    processes = parse_int_param(data.get('processes'), min(os.cpu_count() or 1, max_shard_processes),
+                                upper=max_shard_processes)
+    bandwidth_limit = parse_size_param(data.get('bandwidth'), default_bandwidth_limit)
+    byte_budget = parse_size_param(data.get('maxBytes'), default_byte_budget)
+    min_free_space = parse_size_param(data.get('minFreeSpace'), default_min_free_space)
+    try:
+        cache_ttl = float(data['cacheTtl']) if data.get('cacheTtl') not in (None, '') else None
+    except (TypeError, ValueError):
+        cache_ttl = None
+    job_log_level = parse_log_level(data.get('logLevel'))
+    try:
+        backoff_factor = float(data.get('backoff', default_backoff_factor))
+    except (TypeError, ValueError):
+        backoff_factor = default_backoff_factor
+    
+    if not base_urls:
         return jsonify({"status": "error", "message": "请提供有效的网站URL"})
     
     # 如果下载路径为空，使用默认路径
     if not download_path:
         download_path = default_download_folder
     
-    # 在新线程中运行爬虫
-    threading.Thread(target=crawl_pdfs, args=(base_url, download_path, start_year, end_year)).start()
-    return jsonify({"status": "success", "message": "爬虫已启动"})
+    # 任务在自己的线程中运行
+    job = job_manager.submit(CrawlJob(base_urls, download_path, start_year, end_year, options={
+        "workers": workers, "per_host_limit": per_host_limit,
+        "retries": retries, "backoff_factor": backoff_factor,
+        "incremental": incremental, "discovery_workers": discovery_workers,
+        "chunk_size": chunk_size, "host_rate": host_rate,
+        "respect_robots": respect_robots, "pdf_metadata": pdf_metadata,
+        "page_cache": page_cache, "cache_ttl": cache_ttl, "sitemaps": sitemaps,
+        "resume": resume, "max_pages": max_pages, "processes": processes,
+        "bandwidth_limit": bandwidth_limit, "byte_budget": byte_budget,
+        "min_free_space": min_free_space}, log_level=job_log_level))
+    message = "任务已排队，等待其他任务完成" if job.state == "queued" else "爬虫已启动"
+    return jsonify({"status": "success", "message": message, "job_id": job.id})
 
 @app.route('/status')
 def status():
-    """返回爬虫状态"""
-    files = os.listdir(default_download_folder) if os.path.exists(default_download_folder) else []
+    """返回爬虫状态（最近一个任务的进度和调试信息，以及所有任务的概况）"""
+    latest_job = job_manager.latest()
+    latest = latest_job.snapshot() if latest_job else {}
     return jsonify({
-        "running": running,
-        "last_run": last_run_time,
-        "file_count": len(files),
-        "debug_info": debug_info,
-        "progress": progress
+        "running": job_manager.running_count() > 0 or job_manager.pending_count() > 0,
+        "last_run": pdf_scraper.last_run_time,
+        "file_count": get_catalog(default_download_folder).count(),
+        "debug_info": latest.get("debug_info", debug_events.messages()),
+        "progress": latest.get("progress", new_progress()),
+        "connections": latest.get("connections"),
+        "hosts": latest.get("hosts", {}),
+        "jobs": [job.snapshot(include_log=False) for job in job_manager.jobs()]
     })
 
+@app.route('/jobs')
+def list_jobs():
+    """列出所有爬取任务"""
+    return jsonify({
+        "running": job_manager.running_count(),
+        "pending": job_manager.pending_count(),
+        "max_running": job_manager.max_running,
+        "jobs": [job.snapshot(include_log=False) for job in job_manager.jobs()]
+    })
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    """返回单个任务的进度和调试信息"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": "任务不存在"}), 404
+    return jsonify(job.snapshot())
+
+@app.route('/jobs/<job_id>/log')
+def job_log(job_id):
+    """按游标分页读取任务的结构化日志，可按最低级别过滤"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": "任务不存在"}), 404
+    cursor = parse_int_param(request.args.get('cursor'), 0, lower=0, upper=sys.maxsize)
+    limit = parse_int_param(request.args.get('limit'), max_debug_entries, upper=max_debug_entries)
+    min_level = parse_log_level(request.args.get('level'), logging.NOTSET)
+    last_seq = job.events.last_seq
+    records = job.events.read(cursor, limit, min_level)
+    if len(records) == limit:
+        next_cursor = records[-1]["seq"]  # 还有未读的事件
+    else:
+        # 被级别过滤掉的事件也算已读，下次不再扫描
+        next_cursor = max(cursor, last_seq, records[-1]["seq"] if records else 0)
+    return jsonify({"job_id": job.id, "records": records, "cursor": next_cursor})
+
+def format_event(event, data, event_id=None):
+    """按Server-Sent Events格式编码一个事件"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append("data: " + json.dumps(data, ensure_ascii=False))
+    return "\n".join(lines) + "\n\n"
+
+def job_events(job, cursor):
+    """生成任务的事件流：新的调试信息逐条推送，进度只推送变化的字段"""
+    last_progress = {}
+    last_sent = time.monotonic()
+    while True:
+        for record in job.events.read(cursor):
+            cursor = record["seq"]
+            yield format_event("log", record, cursor)
+            last_sent = time.monotonic()
+        
+        with job.progress_lock:
+            progress = dict(job.progress)
+        delta = {key: value for key, value in progress.items() if last_progress.get(key, object()) != value}
+        if delta:
+            last_progress = progress
+            yield format_event("progress", delta, cursor)
+            last_sent = time.monotonic()
+        
+        if not job.active:
+            yield format_event("end", {"state": job.state}, cursor)
+            return
+        
+        if time.monotonic() - last_sent >= event_keepalive_interval:
+            yield ": keepalive\n\n"
+            last_sent = time.monotonic()
+        job.events.wait(cursor, event_poll_interval)
+
+@app.route('/jobs/<job_id>/events')
+def job_event_stream(job_id):
+    """任务进度的事件流（Server-Sent Events），断线重连时从Last-Event-ID继续"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": "任务不存在"}), 404
+    cursor = parse_int_param(request.headers.get('Last-Event-ID', request.args.get('cursor')),
+                             0, lower=0, upper=sys.maxsize)
+    return Response(job_events(job, cursor), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/files')
+def list_files():
+    """分页、排序的已下载文件列表，可按年份筛选"""
+    page, per_page, sort, descending = parse_listing_args()
+    catalog = get_catalog(default_download_folder)
+    if request.args.get('refresh'):
+        catalog.sync()
+    total, files = catalog.page(page, per_page, sort, descending, request.args.get('year'))
+    return jsonify({
+        "total": total,
+        "page": page,
+        "per_page": per_page,
+        "sort": sort,
+        "order": "desc" if descending else "asc",
+        "files": files
+    })
+
+@app.route('/metrics')
+def export_metrics():
+    """Prometheus格式的运行指标"""
+    states = collections.Counter(job.state for job in job_manager.jobs())
+    for state in ("queued", "running", "finished", "failed"):
+        metrics.set("pdf_scraper_jobs", states.get(state, 0), state=state)
+    return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 # 添加静态文件服务
 @app.route('/downloads/<path:filename>')
 def download_file(filename):
@@ -708,4 +744,7 @@ def download_file(filename):
 
 if __name__ == "__main__":
     # 程序入口点
+    configure_logging()
+    # 确保下载目录存在
+    os.makedirs(default_download_folder, exist_ok=True)
     app.run(host='0.0.0.0', port=5000, debug=True)
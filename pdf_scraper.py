@@ -0,0 +1,2998 @@
+"""造价信息PDF爬虫
+
+可以作为库导入（导入时没有副作用: 不创建目录、不配置日志），也可以从命令行运行:
+
+    python pdf_scraper.py crawl https://example.gov.cn/zjxx/ --years 2023-2025 --out downloads --incremental
+
+库接口为 crawl_pdfs(base_url, download_folder, start_year, end_year, ...)，返回下载的文件名列表；
+传入 CrawlJob 可以获得进度和日志。同时爬取多个网站时用 crawl_sharded，按主机分给多个进程。Web界面见 pdf-scraper-improved.py。
+"""
+import os
+import re
+import sys
+import argparse
+import codecs
+import json
+import contextlib
+import email.utils
+import urllib.robotparser
+import hashlib
+import sqlite3
+import zlib
+import gzip
+import io
+import shutil
+import xml.etree.ElementTree as ElementTree
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from bs4 import BeautifulSoup, SoupStrainer
+try:
+    from lxml import html as lxml_html
+except ImportError:  # 未安装lxml时使用BeautifulSoup解析
+    lxml_html = None
+from urllib.parse import urljoin, urlparse, urlsplit, urlunsplit, unquote
+import logging
+import threading
+import time
+import datetime
+import collections
+import functools
+import itertools
+import heapq
+import array
+import bisect
+import queue
+import uuid
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+# 日志级别 - 可通过环境变量 PDF_SCRAPER_LOG_LEVEL 调整（DEBUG会记录每个链接）
+# 导入模块时不配置日志处理器，由命令行或Web入口调用 configure_logging
+log_level = logging.getLevelName(os.environ.get('PDF_SCRAPER_LOG_LEVEL', 'INFO').upper())
+if not isinstance(log_level, int):
+    log_level = logging.INFO
+log_format = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+logger = logging.getLogger(__name__)
+
+# 全局变量
+default_download_folder = "downloads"
+last_run_time = None
+max_debug_entries = 500  # 每个任务的调试信息环形缓冲区容量
+
+# 任务队列
+# 同时运行的爬取任务数 - 可通过环境变量 PDF_SCRAPER_MAX_JOBS 调整
+try:
+    max_concurrent_jobs = max(1, int(os.environ.get('PDF_SCRAPER_MAX_JOBS', '3')))
+except ValueError:
+    max_concurrent_jobs = 3
+max_finished_jobs = 50  # 保留的已结束任务数
+
+# 多站点分片: 按主机把网站分给多个进程，绕开单进程解析页面时的GIL瓶颈
+max_shard_processes = 16
+shard_report_interval = 0.5  # 分片进程向主进程汇报进度和日志的间隔（秒）
+
+# 并发下载配置
+default_download_workers = 4  # 下载线程数
+default_per_host_limit = 4  # 同一主机的最大并发请求数（页面和PDF合计）
+max_download_workers = 32
+default_discovery_workers = 4  # 并发抓取列表页的线程数
+download_queue_size = 200  # 待下载链接队列的容量，队列满时页面抓取会等待下载跟上
+
+# 页面编码检测
+charset_sniff_bytes = 4096  # 在页面开头查找<meta charset>的字节数
+utf8_sniff_bytes = 65536  # 未声明编码时用于判断是否为UTF-8的字节数
+charset_aliases = {'gb2312': 'gb18030', 'gbk': 'gb18030', 'x-gbk': 'gb18030'}  # GB18030兼容GBK/GB2312
+header_charset_pattern = re.compile(r'charset\s*=\s*["\']?\s*([\w\-]+)', re.I)
+meta_charset_pattern = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?\s*([\w\-]+)', re.I)
+
+# 链接文本包含这些关键词的页面会被继续检查
+subpage_keywords = ('造价信息', '造价', '信息价', '建设工程', '定额')
+
+# 页面优先级: 待抓取页面按得分从高到低抓取，页面数达到上限时停止
+subpage_keyword_scores = {'信息价': 2.0, '造价信息': 2.0, '造价': 1.0, '定额': 1.0, '建设工程': 0.5}
+year_match_score = 2.0  # 链接的年份在范围内
+year_mismatch_penalty = 1.0  # 链接中只有单独的年份（如 /col/col2019/）且不在范围内，不确定是否为年份，只降低优先级
+month_match_score = 0.5  # 链接同时带有月份（通常是具体某一期的列表页）
+depth_penalty = 0.5  # 每深一层减去的分数
+yield_score = 0.5  # 同类URL已抓取页面平均每页的PDF数乘以该系数（最多按4个计）
+barren_pages = 3  # 同类URL抓取了这么多页面还没有PDF时降低优先级
+barren_penalty = 1.0
+default_max_pages = 0  # 每次爬取最多抓取的页面数，0表示不限
+url_digits_pattern = re.compile(r'\d+')
+
+# 站点地图和RSS/Atom: 先从中查找PDF和内容页面，找到时只浅层遍历网页
+sitemap_paths = ('/sitemap.xml',)  # robots.txt没有列出Sitemap时尝试的路径
+max_sitemap_files = 50  # 最多读取的站点地图和订阅源个数（含索引中的子站点地图）
+max_sitemap_pages = 500  # 从站点地图加入待抓取的内容页面上限（按 LinkScorer 的得分取前面的）
+# 没有标题的站点地图条目只接受列表页形状的URL，如 /2024/03/、/2024/03/index.html、/2024/list_2.html
+listing_page_pattern = re.compile(r'/(?:(?:index|default|list)[\w-]*\.(?:s?html?|php|jsp|aspx?))?$', re.I)
+gzip_magic = b'\x1f\x8b'  # gzip文件的前两个字节
+feed_link_pattern = re.compile(
+    rb'<link\b[^>]*type\s*=\s*["\']application/(?:rss|atom)\+xml["\'][^>]*>', re.I)
+feed_href_pattern = re.compile(rb'href\s*=\s*["\']([^"\']+)["\']', re.I)
+
+# 链接解析: 从URL路径和链接文本中提取年份、月份、类别和区县（按可信度从高到低匹配）
+link_date_patterns = tuple(re.compile(pattern) for pattern in (
+    r'(?<!\d)(?P<year>20\d{2})\s*年(?:\s*(?P<month>\d{1,2})\s*月)?',  # 2024年3月
+    r'(?<!\d)(?P<year>20\d{2})[-_/.](?P<month>\d{1,2})(?!\d)',  # 2024-03、/2024/03/
+    r'P0(?P<year>20\d{2})(?P<month>0[1-9]|1[0-2])[0-3]\d',  # 政府网站附件命名，如 P020240315388.pdf
+    r'(?<!\d)(?P<year>20\d{2})(?P<month>0[1-9]|1[0-2])(?:[0-3]\d)?(?!\d)',  # 20240315、202403
+    r'(?<!\d)(?P<year>20\d{2})(?!\d)',  # 单独的年份（不匹配更长数字ID中的片段）
+))
+bare_year_rank = len(link_date_patterns) - 1  # URL中只匹配到单独年份时的可信度，可能是栏目编号等
+link_month_pattern = re.compile(r'(?<!\d)(?P<month>1[0-2]|0?[1-9])\s*月')
+link_categories = ('造价信息', '信息价', '造价', '定额', '指数', '参考价', '市场价', '建设工程')  # 按优先级排列
+# 区县只在 省/市/州 之后或括号内匹配，如 北京市海淀区、信息价（朝阳区）；去掉 小区、地区 等通用词
+link_district_pattern = re.compile(
+    r'(?:(?<=[省市州])|(?<=[（(【\[]))(?:(?![年月日号期第的和及与于在发布关各全本省市县区份季度])[\u4e00-\u9fff]){2,3}'
+    r'(?:新区|区|县)')
+link_district_generic = ('小区', '社区', '地区', '郊区', '市区', '辖区', '片区', '园区', '景区', '校区', '库区',
+                         '主城区', '老城区', '开发区', '示范区', '保护区')
+link_cache_size = 65536  # 解析结果缓存的条目数
+
+# HTTP会话配置
+request_timeout = 30
+default_retries = 3  # 连接错误和5xx响应的重试次数
+default_backoff_factor = 0.5  # 重试间隔: backoff_factor * 2^(n-1) 秒
+retry_status_codes = (500, 502, 504)  # 429/503由主机调度器处理
+default_headers = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
+    'Connection': 'keep-alive'
+}
+page_headers = {'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8'}
+pdf_headers = {'Accept': 'application/pdf,*/*'}
+
+# 主机调度: 每个主机的请求速率、并发数和限流退避
+default_host_rate = 0.0  # 每个主机每秒最多发送的请求数，0表示不限制（仍会在被限流时退避）
+throttle_status_codes = (429, 503)
+throttle_attempts = 4  # 被限流时的总尝试次数
+min_backoff_seconds = 1.0
+max_backoff_seconds = 300.0
+
+# 下载配置
+default_chunk_size = 64 * 1024  # 每次写入磁盘的块大小（字节）
+max_chunk_size = 8 * 1024 * 1024
+download_attempts = 3  # 传输中断后用Range续传的总尝试次数
+
+# 传输限制: 一次爬取的所有下载线程共用带宽上限和字节预算，下载前按Content-Length预留磁盘空间
+default_bandwidth_limit = 0  # 下载带宽上限（字节/秒），0表示不限
+bandwidth_burst_seconds = 1.0  # 令牌桶容量: 空闲后最多积攒多少秒的流量
+default_byte_budget = 0  # 每次爬取最多下载的PDF字节数，0表示不限
+default_min_free_space = 512 * 1024 * 1024  # 下载目录所在磁盘至少保留的空闲空间（字节）
+disk_check_interval = 8 * 1024 * 1024  # 每写入这么多字节复查一次磁盘空闲空间
+
+# PDF校验: 文件头必须在开头的1024字节内，%%EOF必须在最后的1024字节内
+pdf_header_window = 1024
+pdf_trailer_window = 1024
+pdf_scan_margin = 4096  # 分块扫描元数据时留到下一块再匹配的字节数（大于最长的标记）
+pdf_token_pattern = re.compile(
+    rb'/Type\s*/Page(?![A-Za-z])'
+    rb'|/Title\s*(\((?:\\.|[^\\)]){0,1024}\)|<[0-9A-Fa-f\s]{0,2048}>)'
+    rb'|/CreationDate\s*\(D:(\d{4,14})'
+    rb'|/Info\s+(\d{1,10})\s+(\d{1,5})\s+R', re.S)  # trailer中文档信息对象的引用
+# 对象开始的编号，如 12 0 obj；只在找到标题或日期时向前查找，所有标记都以/开头，扫描才快
+pdf_object_number_pattern = re.compile(rb'(?<![\w.])(\d{1,10})\s+(\d{1,5})\s+$')
+pdf_object_tail_pattern = re.compile(rb'[\d\s]{0,32}(?:ob?)?$')  # 块末尾可能被截断的对象开始
+
+# 运行指标（/metrics，Prometheus文本格式）
+latency_buckets = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+parse_time_buckets = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+metric_definitions = {
+    # 名称: (类型, 说明, 直方图分桶)
+    "pdf_scraper_pages_fetched_total": ("counter", "抓取的页面数", None),
+    "pdf_scraper_pdfs_found_total": ("counter", "发现的PDF链接数（年份范围内）", None),
+    "pdf_scraper_pdfs_skipped_total": ("counter", "跳过的PDF数，按原因区分", None),
+    "pdf_scraper_pdfs_downloaded_total": ("counter", "下载完成的PDF数（含内容重复的文件）", None),
+    "pdf_scraper_pdf_duplicates_total": ("counter", "内容与已保存文件相同的PDF数", None),
+    "pdf_scraper_bytes_transferred_total": ("counter", "收到的响应内容字节数", None),
+    "pdf_scraper_responses_total": ("counter", "HTTP响应数，按主机和状态码区分", None),
+    "pdf_scraper_bandwidth_wait_seconds_total": ("counter", "下载因带宽上限等待的总秒数", None),
+    "pdf_scraper_page_cache_total": ("counter", "列表页缓存的使用情况: hit直接使用, revalidated经304确认, miss重新获取", None),
+    "pdf_scraper_request_duration_seconds": ("histogram", "页面抓取和PDF下载的耗时", latency_buckets),
+    "pdf_scraper_parse_duration_seconds": ("histogram", "解析页面HTML和提取链接的耗时", parse_time_buckets),
+    "pdf_scraper_requests_in_flight": ("gauge", "正在进行的页面抓取和PDF下载数", None),
+    "pdf_scraper_jobs": ("gauge", "爬取任务数，按状态区分", None),
+}
+
+# 增量爬取: 下载清单保存在下载目录中（隐藏文件，不显示在文件列表里）
+manifest_file_name = ".pdf_manifest.sqlite3"
+
+# 列表页缓存: 跨多次爬取保存页面（或解析出的链接），按Cache-Control/ETag判断是否需要重新获取
+page_cache_file_name = ".page_cache.sqlite3"
+page_cache_max_bytes = 64 * 1024 * 1024  # 缓存总大小上限，超过时淘汰最久未使用的页面
+page_cache_links = True  # 缓存解析出的链接列表（命中时跳过解析）；为False时缓存压缩后的页面内容
+
+# URL去重: 按规范化后的URL去重，只在内存中保存8字节的指纹
+default_ports = {'http': 80, 'https': 443}
+index_file_pattern = re.compile(r'/(?:index|default)\.(?:s?html?|php|jsp|aspx?)$', re.I)
+percent_escape_pattern = re.compile(r'%[0-9a-f]{2}', re.I)
+fingerprint_buffer_size = 65536  # 新指纹先放在集合中，攒够后合并进有序数组
+
+# 爬取检查点: 定期保存待抓取页面、已抓取页面和PDF的下载状态，中断后可以从检查点继续
+checkpoint_file_name = ".crawl_checkpoint.sqlite3"
+checkpoint_interval = 5.0  # 写入检查点的间隔（秒），中断时最多丢失这段时间内的进度
+
+def create_session(pool_size=default_download_workers, retries=default_retries,
+                   backoff_factor=default_backoff_factor):
+    """创建带连接池和重试策略的HTTP会话"""
+    session = requests.Session()
+    session.headers.update(default_headers)
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=retry_status_codes,
+        allowed_methods=frozenset(['GET', 'HEAD']),
+        raise_on_status=False,
+        respect_retry_after_header=False,  # 带Retry-After的429/503交给主机调度器退避
+    )
+    # pool_maxsize 与并发线程数一致，避免线程之间争抢连接而频繁新建连接
+    adapter = HTTPAdapter(pool_connections=10, pool_maxsize=max(1, pool_size), max_retries=retry)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+class DownloadManifest:
+    """按PDF URL记录下载元数据（ETag、Last-Modified、长度、哈希、文件名，以及PDF的页数、标题和创建日期）"""
+
+    def __init__(self, folder):
+        self.path = os.path.join(folder, manifest_file_name)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS pdfs (
+                    url TEXT PRIMARY KEY,
+                    etag TEXT,
+                    last_modified TEXT,
+                    content_length INTEGER,
+                    sha256 TEXT,
+                    file_name TEXT,
+                    updated_at REAL,
+                    pages INTEGER,
+                    title TEXT,
+                    created TEXT
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS pdfs_sha256 ON pdfs (sha256)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS pdfs_file_name ON pdfs (file_name)")
+            self._conn.commit()
+
+    def get(self, url):
+        """返回URL的记录，不存在时返回None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT etag, last_modified, content_length, sha256, file_name FROM pdfs WHERE url = ?",
+                (url,)).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("etag", "last_modified", "content_length", "sha256", "file_name"), row))
+
+    def record(self, url, etag=None, last_modified=None, content_length=None, sha256=None, file_name=None,
+               metadata=None):
+        """写入或更新URL的记录"""
+        metadata = metadata or {}
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pdfs (url, etag, last_modified, content_length, sha256, file_name, "
+                "updated_at, pages, title, created) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, etag, last_modified, content_length, sha256, file_name, time.time(),
+                 metadata.get("pages"), metadata.get("title"), metadata.get("created")))
+            self._conn.commit()
+
+    def find_by_hash(self, sha256):
+        """返回内容哈希相同的已保存文件名，没有时返回None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT file_name FROM pdfs WHERE sha256 = ? AND file_name IS NOT NULL "
+                "ORDER BY updated_at LIMIT 1", (sha256,)).fetchone()
+        return row[0] if row else None
+
+    def hash_of_file(self, file_name):
+        """返回已保存文件的内容哈希，清单中没有该文件时返回None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT sha256 FROM pdfs WHERE file_name = ? AND sha256 IS NOT NULL LIMIT 1",
+                (file_name,)).fetchone()
+        return row[0] if row else None
+
+    def owner_of_file(self, file_name):
+        """返回使用该文件的URL中排序最前的一个，清单中没有该文件时返回None"""
+        with self._lock:
+            row = self._conn.execute("SELECT MIN(url) FROM pdfs WHERE file_name = ?", (file_name,)).fetchone()
+        return row[0]
+
+    def alias_of_file(self, file_name, url):
+        """返回同样使用该文件的另一个URL（内容相同的别名），没有时返回None"""
+        with self._lock:
+            row = self._conn.execute("SELECT MIN(url) FROM pdfs WHERE file_name = ? AND url != ?",
+                                     (file_name, url)).fetchone()
+        return row[0]
+
+    def rename_file(self, old_name, new_name):
+        """文件改名后更新所有使用它的记录"""
+        with self._lock:
+            self._conn.execute("UPDATE pdfs SET file_name = ? WHERE file_name = ?", (new_name, old_name))
+            self._conn.commit()
+
+    def touch(self, url):
+        """标记URL在本次爬取中已确认未变化"""
+        with self._lock:
+            self._conn.execute("UPDATE pdfs SET updated_at = ? WHERE url = ?", (time.time(), url))
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+def parse_cache_control(value):
+    """解析Cache-Control响应头，返回 {指令: 值}，没有值的指令为True"""
+    directives = {}
+    for part in (value or '').split(','):
+        name, _, argument = part.strip().partition('=')
+        if name:
+            directives[name.lower()] = argument.strip('"') if argument else True
+    return directives
+
+class PageCache:
+    """磁盘上的列表页缓存（SQLite），按最近使用时间淘汰，总大小不超过上限
+
+    新鲜度按响应的Cache-Control(max-age/no-cache/no-store)和Expires判断，过期后用
+    ETag/Last-Modified发送条件请求；ttl 和 ttl_by_depth（页面深度 -> 秒）可以覆盖
+    服务器给出的新鲜度。
+    """
+
+    def __init__(self, path, max_bytes=page_cache_max_bytes, ttl=None, ttl_by_depth=None,
+                 cache_links=page_cache_links):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.ttl_by_depth = dict(ttl_by_depth or {})
+        self.cache_links = cache_links
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS pages (
+                    url TEXT PRIMARY KEY,
+                    etag TEXT,
+                    last_modified TEXT,
+                    checked_at REAL,
+                    expires_at REAL,
+                    no_cache INTEGER,
+                    charset TEXT,
+                    title TEXT,
+                    links TEXT,
+                    content BLOB,
+                    size INTEGER,
+                    used_at REAL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS pages_used_at ON pages (used_at)")
+            self._conn.commit()
+            self._total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+
+    def get(self, url):
+        """返回URL的缓存记录，不存在时返回None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT etag, last_modified, checked_at, expires_at, no_cache, charset, title, links, content "
+                "FROM pages WHERE url = ?", (url,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE pages SET used_at = ? WHERE url = ?", (time.time(), url))
+            self._conn.commit()
+        return dict(zip(("etag", "last_modified", "checked_at", "expires_at", "no_cache",
+                         "charset", "title", "links", "content"), row))
+
+    def is_fresh(self, entry, depth):
+        """缓存的页面是否可以不经验证直接使用"""
+        ttl = self.ttl_by_depth.get(depth, self.ttl)
+        if ttl is not None:
+            return time.time() - entry["checked_at"] < ttl
+        return not entry["no_cache"] and entry["expires_at"] is not None and time.time() < entry["expires_at"]
+
+    def page_links(self, entry):
+        """返回缓存页面的 (标题, 链接列表)；只缓存了页面内容时重新解析"""
+        if entry["links"] is not None:
+            return entry["title"], [tuple(link) for link in json.loads(entry["links"])]
+        return extract_links(zlib.decompress(entry["content"]), entry["charset"])
+
+    def store(self, url, headers, content, charset, title, links):
+        """保存新获取的页面；响应带no-store时删除已有的缓存"""
+        directives = parse_cache_control(headers.get('Cache-Control'))
+        if 'no-store' in directives:
+            self.remove(url)
+            return
+        if self.cache_links:
+            links_json, blob = json.dumps(links, ensure_ascii=False), None
+            size = len(links_json.encode('utf-8'))
+        else:
+            links_json, blob = None, zlib.compress(content)
+            size = len(blob)
+        now = time.time()
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM pages WHERE url = ?", (url,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages (url, etag, last_modified, checked_at, expires_at, no_cache, "
+                "charset, title, links, content, size, used_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, headers.get('ETag'), headers.get('Last-Modified'), now, self._expires_at(headers, directives),
+                 int('no-cache' in directives), charset, title, links_json, blob, size, now))
+            self._total += size - (old[0] if old else 0)
+            self._evict()
+            self._conn.commit()
+
+    def refresh(self, url, headers):
+        """服务器确认页面未变化(304)后更新验证时间和新鲜度"""
+        directives = parse_cache_control(headers.get('Cache-Control'))
+        with self._lock:
+            self._conn.execute(
+                "UPDATE pages SET checked_at = ?, expires_at = ?, no_cache = ?, "
+                "etag = COALESCE(?, etag), last_modified = COALESCE(?, last_modified) WHERE url = ?",
+                (time.time(), self._expires_at(headers, directives), int('no-cache' in directives),
+                 headers.get('ETag'), headers.get('Last-Modified'), url))
+            self._conn.commit()
+
+    def remove(self, url):
+        with self._lock:
+            row = self._conn.execute("SELECT size FROM pages WHERE url = ?", (url,)).fetchone()
+            if row:
+                self._conn.execute("DELETE FROM pages WHERE url = ?", (url,))
+                self._total -= row[0]
+                self._conn.commit()
+
+    @staticmethod
+    def _expires_at(headers, directives):
+        max_age = directives.get('max-age')
+        if max_age is not None and max_age is not True and max_age.isdigit():
+            return time.time() + int(max_age)
+        expires = headers.get('Expires')
+        if expires:
+            try:
+                return email.utils.parsedate_to_datetime(expires).timestamp()
+            except (TypeError, ValueError):
+                return None  # 无效的Expires表示已过期
+        return None
+
+    def _evict(self):
+        """超过大小上限时删除最久未使用的页面，调用方需持有锁"""
+        if self._total <= self.max_bytes:
+            return
+        target = self.max_bytes * 0.9  # 多删一些，避免每次写入都触发淘汰
+        rows = self._conn.execute("SELECT url, size FROM pages ORDER BY used_at").fetchall()
+        for url, size in rows:
+            if self._total <= target:
+                break
+            self._conn.execute("DELETE FROM pages WHERE url = ?", (url,))
+            self._total -= size
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+def canonical_url(url):
+    """规范化URL用于去重: 协议和主机名小写，去掉默认端口和#片段，查询参数排序，
+    百分号编码统一为大写，目录下的 index.html/default.aspx 等同于目录本身"""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    netloc = parts.netloc.rpartition('@')[2].lower()
+    default_port = default_ports.get(scheme)
+    if default_port and netloc.endswith(f":{default_port}"):
+        netloc = netloc[:-len(str(default_port)) - 1]
+    path = parts.path
+    if '%' in path:
+        path = percent_escape_pattern.sub(lambda m: m.group().upper(), path)
+    path = index_file_pattern.sub('/', path) or '/'
+    query = parts.query
+    if '&' in query:
+        query = '&'.join(sorted(query.split('&')))
+    return urlunsplit((scheme, netloc, path, query, ''))
+
+@functools.lru_cache(maxsize=link_cache_size)
+def url_fingerprint(url):
+    """URL的64位指纹（有符号整数，可直接存入SQLite）；http和https视为同一URL
+
+    导航栏等链接在每个页面上重复出现，结果按URL缓存。
+    """
+    key = canonical_url(url).split('://', 1)[-1]
+    return int.from_bytes(hashlib.blake2b(key.encode('utf-8', 'surrogatepass'), digest_size=8).digest(),
+                          'big', signed=True)
+
+class FingerprintSet:
+    """紧凑的URL去重集合: 只保存URL指纹，每个URL约8字节
+
+    新指纹先放在普通集合中，攒够 fingerprint_buffer_size 个后合并进有序的 array('q')，
+    查询时二分查找。64位指纹在几十万个URL中发生碰撞的概率可以忽略。
+    不是线程安全的，由调用方加锁。
+    """
+
+    def __init__(self, fingerprints=()):
+        self._sorted = array.array('q', sorted(set(fingerprints)))
+        self._recent = set()
+
+    def add(self, url):
+        """加入URL，已存在时返回False"""
+        return self.add_fingerprint(url_fingerprint(url))
+
+    def add_fingerprint(self, fingerprint):
+        if self._has(fingerprint):
+            return False
+        self._recent.add(fingerprint)
+        if len(self._recent) >= fingerprint_buffer_size:
+            self._merge()
+        return True
+
+    def __contains__(self, url):
+        return self._has(url_fingerprint(url))
+
+    def __len__(self):
+        return len(self._sorted) + len(self._recent)
+
+    def _has(self, fingerprint):
+        if fingerprint in self._recent:
+            return True
+        index = bisect.bisect_left(self._sorted, fingerprint)
+        return index < len(self._sorted) and self._sorted[index] == fingerprint
+
+    def _merge(self):
+        if self._recent:
+            self._sorted = array.array('q', sorted(itertools.chain(self._sorted, self._recent)))
+        self._recent.clear()
+
+    def fingerprints(self):
+        self._merge()
+        return self._sorted.tolist()
+
+class CrawlCheckpoint:
+    """一次爬取的检查点（SQLite）：待抓取页面的URL和深度，已抓取页面的指纹，PDF链接是否已下载
+
+    状态变化先记在内存中，每隔 checkpoint_interval 秒在一个事务里批量写入；
+    同一目录下的多个网站（如分片爬取）按起始网址分开保存。写入失败（如磁盘已满、
+    数据库被锁）只记录警告，变化留在内存中下次再写，不影响爬取。
+    """
+
+    def __init__(self, folder, base_url, start_year=None, end_year=None, interval=checkpoint_interval):
+        self.base_url = base_url
+        self.years = f"{start_year or ''}-{end_year or ''}"
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._pages = {}  # url -> (深度, 是否已抓取)
+        self._pdfs = {}  # url -> (链接文本, 是否已下载)，文本为None时沿用已保存的
+        self._flushed_at = time.monotonic()
+        self._conn = sqlite3.connect(os.path.join(folder, checkpoint_file_name), check_same_thread=False)
+        with self._lock:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS crawls (
+                    base_url TEXT PRIMARY KEY,
+                    years TEXT,
+                    updated_at REAL
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS pages (
+                    base_url TEXT,
+                    url TEXT,
+                    depth INTEGER,
+                    done INTEGER,
+                    PRIMARY KEY (base_url, url)
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS seen (
+                    base_url TEXT,
+                    fingerprint INTEGER,
+                    PRIMARY KEY (base_url, fingerprint)
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS pdfs (
+                    base_url TEXT,
+                    url TEXT,
+                    text TEXT,
+                    done INTEGER,
+                    PRIMARY KEY (base_url, url)
+                )
+            """)
+            self._conn.commit()
+
+    def load(self):
+        """返回上次中断时保存的 (待抓取页面[(url, 深度)], 已抓取页面的 FingerprintSet, PDF列表[(url, 链接文本, 是否已下载)])
+
+        没有检查点或年份范围不同时返回None。
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT years FROM crawls WHERE base_url = ?", (self.base_url,)).fetchone()
+            if row is None or row[0] != self.years:
+                return None
+            seen = FingerprintSet(fingerprint for fingerprint, in self._conn.execute(
+                "SELECT fingerprint FROM seen WHERE base_url = ?", (self.base_url,)))
+            pages = []
+            for url, depth, done in self._conn.execute(
+                    "SELECT url, depth, done FROM pages WHERE base_url = ? ORDER BY rowid", (self.base_url,)):
+                if done:
+                    seen.add(url)
+                else:
+                    pages.append((url, depth))
+            pdfs = [(url, text or '', bool(done)) for url, text, done in self._conn.execute(
+                "SELECT url, text, done FROM pdfs WHERE base_url = ? ORDER BY rowid", (self.base_url,))]
+        return (pages, seen, pdfs) if pages or len(seen) or pdfs else None
+
+    def reset(self):
+        """删除该网站的旧检查点，开始新的一次爬取"""
+        with self._lock:
+            self._pages.clear()
+            self._pdfs.clear()
+            self._delete()
+            self._conn.execute("INSERT INTO crawls (base_url, years, updated_at) VALUES (?, ?, ?)",
+                               (self.base_url, self.years, time.time()))
+            self._conn.commit()
+
+    def page_queued(self, url, depth):
+        self._update(self._pages, url, (depth, False))
+
+    def page_done(self, url, depth):
+        self._update(self._pages, url, (depth, True))
+
+    def pdf_found(self, url, text=''):
+        self._update(self._pdfs, url, (text, False))
+
+    def pdf_done(self, url):
+        with self._lock:
+            text = self._pdfs.get(url, (None, False))[0]
+        self._update(self._pdfs, url, (text, True))
+
+    def _update(self, changes, url, value):
+        with self._lock:
+            changes[url] = value
+            if time.monotonic() - self._flushed_at >= self.interval:
+                self._try_flush()
+
+    def flush(self):
+        with self._lock:
+            self._try_flush()
+
+    def _try_flush(self):
+        """写入状态变化，失败时回滚并记录警告，调用方需持有锁"""
+        try:
+            self._flush()
+        except sqlite3.Error as e:
+            with contextlib.suppress(sqlite3.Error):
+                self._conn.rollback()
+            add_debug_info(f"写入检查点失败，稍后重试: {str(e)}", level=logging.WARNING, event="resume")
+
+    def _flush(self):
+        """把内存中的状态变化写入磁盘，调用方需持有锁"""
+        self._flushed_at = time.monotonic()
+        if not (self._pages or self._pdfs):
+            return
+        # 已抓取的页面只保存指纹
+        done_pages = [url for url, (_, done) in self._pages.items() if done]
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO pages (base_url, url, depth, done) VALUES (?, ?, ?, 0)",
+            [(self.base_url, url, depth) for url, (depth, done) in self._pages.items() if not done])
+        self._conn.executemany("DELETE FROM pages WHERE base_url = ? AND url = ?",
+                               [(self.base_url, url) for url in done_pages])
+        self._conn.executemany("INSERT OR IGNORE INTO seen (base_url, fingerprint) VALUES (?, ?)",
+                               [(self.base_url, url_fingerprint(url)) for url in done_pages])
+        self._conn.executemany(
+            "INSERT INTO pdfs (base_url, url, text, done) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (base_url, url) DO UPDATE SET done = excluded.done, "
+            "text = COALESCE(excluded.text, pdfs.text)",
+            [(self.base_url, url, text, int(done)) for url, (text, done) in self._pdfs.items()])
+        self._conn.execute("UPDATE crawls SET updated_at = ? WHERE base_url = ?", (time.time(), self.base_url))
+        self._conn.commit()
+        self._pages.clear()
+        self._pdfs.clear()
+
+    def finish(self):
+        """爬取完整结束，不再需要检查点"""
+        with self._lock:
+            self._pages.clear()
+            self._pdfs.clear()
+            self._delete()
+            self._conn.commit()
+
+    def _delete(self):
+        for table in ("pages", "seen", "pdfs", "crawls"):
+            self._conn.execute(f"DELETE FROM {table} WHERE base_url = ?", (self.base_url,))
+
+    def close(self):
+        with self._lock:
+            self._try_flush()
+            self._conn.close()
+
+def parse_retry_after(value):
+    """解析Retry-After头（秒数或HTTP日期），返回等待秒数"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at is None:
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=datetime.timezone.utc)
+    return max((retry_at - datetime.datetime.now(datetime.timezone.utc)).total_seconds(), 0.0)
+
+class HostState:
+    """单个主机的调度状态"""
+
+    def __init__(self, concurrency):
+        self.lock = threading.Lock()
+        self.semaphore = threading.BoundedSemaphore(concurrency)
+        self.next_time = 0.0  # 下一个请求最早的发送时间（time.monotonic）
+        self.backoff_until = 0.0
+        self.backoff = 0.0  # 当前退避时长，被限流时加倍，成功时减半
+        self.crawl_delay = None  # robots.txt中的Crawl-delay
+        self.robots_checked = False
+        self.in_flight = 0
+        self.requests = 0
+        self.throttled = 0
+
+class HostScheduler:
+    """按主机控制请求速率和并发数，遇到429/503时自适应退避"""
+
+    def __init__(self, rate=default_host_rate, concurrency=default_per_host_limit,
+                 respect_robots=False, session=None):
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self.concurrency = max(1, concurrency)
+        self.respect_robots = respect_robots
+        self.session = session
+        self._lock = threading.Lock()
+        self._hosts = {}
+
+    def _state(self, url):
+        host = urlparse(url).netloc
+        with self._lock:
+            if host not in self._hosts:
+                self._hosts[host] = HostState(self.concurrency)
+            return self._hosts[host]
+
+    @contextlib.contextmanager
+    def slot(self, url):
+        """占用主机的一个并发名额，直到请求（包括下载内容）完成"""
+        state = self._state(url)
+        state.semaphore.acquire()
+        with state.lock:
+            state.in_flight += 1
+        try:
+            yield
+        finally:
+            with state.lock:
+                state.in_flight -= 1
+            state.semaphore.release()
+
+    def wait_turn(self, url):
+        """按速率限制、Crawl-delay和退避时间等待，直到可以发送请求"""
+        state = self._state(url)
+        if self.respect_robots and not state.robots_checked:
+            self._load_robots(url, state)
+        with state.lock:
+            interval = max(self.interval, state.crawl_delay or 0.0)
+            now = time.monotonic()
+            send_at = max(now, state.next_time, state.backoff_until)
+            state.next_time = send_at + interval
+            state.requests += 1
+        if send_at > now:
+            time.sleep(send_at - now)
+
+    def feedback(self, url, status_code, retry_after=None):
+        """根据响应状态调整退避时间，返回被限流时需要等待的秒数"""
+        state = self._state(url)
+        with state.lock:
+            if status_code in throttle_status_codes:
+                state.throttled += 1
+                delay = parse_retry_after(retry_after)
+                if delay is None:
+                    delay = max(state.backoff * 2, min_backoff_seconds)
+                state.backoff = min(delay, max_backoff_seconds)
+                state.backoff_until = time.monotonic() + state.backoff
+                return state.backoff
+            if status_code < 400 and state.backoff:
+                state.backoff = state.backoff / 2 if state.backoff > min_backoff_seconds else 0.0
+            return 0.0
+
+    def _load_robots(self, url, state):
+        """读取robots.txt中的Crawl-delay（每个主机只读取一次）"""
+        with state.lock:
+            if state.robots_checked:
+                return
+            state.robots_checked = True
+        parsed = urlparse(url)
+        robots_url = f"{parsed.scheme}://{parsed.netloc}/robots.txt"
+        parser = urllib.robotparser.RobotFileParser()
+        try:
+            session = self.session or requests
+            response = session.get(robots_url, timeout=request_timeout)
+            if response.status_code == 200:
+                parser.parse(response.text.splitlines())
+                parser.modified()  # crawl_delay() 只在标记为已读取后返回结果
+                delay = parser.crawl_delay(default_headers['User-Agent']) or parser.crawl_delay('*')
+                if delay:
+                    with state.lock:
+                        state.crawl_delay = float(delay)
+                    add_debug_info(f"{parsed.netloc} 的robots.txt要求抓取间隔 {delay} 秒", event="robots")
+        except Exception as e:
+            add_debug_info(f"读取robots.txt失败: {str(e)}", level=logging.WARNING, url=robots_url, event="robots")
+
+    def snapshot(self):
+        """返回各主机的调度状态，用于/status"""
+        with self._lock:
+            hosts = dict(self._hosts)
+        now = time.monotonic()
+        result = {}
+        for host, state in hosts.items():
+            with state.lock:
+                result[host] = {
+                    "in_flight": state.in_flight,
+                    "requests": state.requests,
+                    "throttled": state.throttled,
+                    "backoff_seconds": round(state.backoff, 2),
+                    "backoff_remaining": round(max(state.backoff_until - now, 0.0), 2),
+                    "crawl_delay": state.crawl_delay,
+                }
+        return result
+
+class TransferLimiter:
+    """一次爬取中所有下载线程共用的传输限制: 带宽上限、字节预算和磁盘空闲空间
+
+    带宽用令牌桶限制，令牌可以透支，透支的部分按速率等待，任意大小的块都能通过。
+    下载前按Content-Length预留预算和磁盘空间，传输中定期复查磁盘空闲空间。
+    folder 为None时不检查磁盘空间。
+    """
+
+    def __init__(self, folder=None, rate=default_bandwidth_limit, byte_budget=default_byte_budget,
+                 min_free_space=default_min_free_space):
+        self.folder = folder
+        self.rate = float(rate) if rate and rate > 0 else 0.0
+        self.capacity = self.rate * bandwidth_burst_seconds
+        self.byte_budget = max(int(byte_budget or 0), 0)
+        self.min_free_space = max(int(min_free_space or 0), 0)
+        self._lock = threading.Lock()
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._reserved = 0  # 正在下载的文件还没收到的预留字节数
+        self._unchecked = 0  # 上次检查磁盘空间后写入的字节数
+        self.used = 0  # 已收到的字节数
+        self.waited = 0.0  # 因带宽上限等待的总秒数
+
+    def _free_space(self):
+        """磁盘空闲字节数减去已预留的部分；无法获取时返回None（调用时持有锁）"""
+        try:
+            return shutil.disk_usage(self.folder).free - self._reserved
+        except OSError:
+            return None
+
+    def exhausted(self):
+        """字节预算已用完（含正在下载的文件预留的部分）"""
+        with self._lock:
+            return bool(self.byte_budget) and self.used + self._reserved >= self.byte_budget
+
+    def reserve(self, size):
+        """下载前预留size字节；预算不足返回 'budget'，磁盘空间不足返回 'disk_full'，成功返回None"""
+        with self._lock:
+            if self.byte_budget and self.used + self._reserved + size > self.byte_budget:
+                return 'budget'
+            if self.folder is not None:
+                free = self._free_space()
+                if free is not None and free - size < self.min_free_space:
+                    return 'disk_full'
+            self._reserved += size
+            return None
+
+    def release(self, size):
+        """归还没有用到的预留字节"""
+        with self._lock:
+            self._reserved -= size
+
+    def transfer(self, size, reserved=0):
+        """写入size字节后调用（其中reserved字节已预留）: 超过带宽上限时等待；
+        超出预算返回 'budget'，磁盘空间不足返回 'disk_full'，否则返回None"""
+        delay = 0.0
+        reason = None
+        with self._lock:
+            self._reserved -= reserved
+            self.used += size
+            if self.rate:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                self._tokens -= size
+                if self._tokens < 0:
+                    delay = -self._tokens / self.rate
+                    self.waited += delay
+            if self.byte_budget and self.used > self.byte_budget:
+                reason = 'budget'
+            elif self.folder is not None:
+                self._unchecked += size
+                if self._unchecked >= disk_check_interval:
+                    self._unchecked = 0
+                    free = self._free_space()
+                    if free is not None and free < self.min_free_space:
+                        reason = 'disk_full'
+        if delay:
+            metrics.inc("pdf_scraper_bandwidth_wait_seconds_total", delay)
+            time.sleep(delay)
+        return reason
+
+    def snapshot(self):
+        """返回带宽和预算的使用情况，用于/status"""
+        with self._lock:
+            return {
+                "bandwidth_limit": self.rate or None,
+                "byte_budget": self.byte_budget or None,
+                "bytes": self.used,
+                "reserved": self._reserved,
+                "waited_seconds": round(self.waited, 2),
+            }
+
+class CrawlContext:
+    """一次爬取共享的资源：带连接池的HTTP会话、主机调度器、下载清单和下载参数"""
+
+    def __init__(self, pool_size=default_download_workers, retries=default_retries,
+                 backoff_factor=default_backoff_factor, manifest=None, incremental=False,
+                 chunk_size=default_chunk_size, host_rate=default_host_rate,
+                 per_host_limit=default_per_host_limit, respect_robots=False, pdf_metadata=True):
+        self.session = create_session(pool_size, retries, backoff_factor)
+        self.scheduler = HostScheduler(host_rate, per_host_limit, respect_robots, self.session)
+        self.chunk_size = chunk_size
+        self.manifest = manifest
+        self.incremental = incremental  # 为True时根据清单发送条件请求，跳过未变化的文件
+        self.pdf_metadata = pdf_metadata  # 下载时提取PDF的页数、标题和创建日期
+        self.page_cache = None  # 启用时为 PageCache
+        self.checkpoint = None  # 爬取时为 CrawlCheckpoint
+        self.transfer = TransferLimiter()  # 爬取时换成带下载目录和限制参数的 TransferLimiter
+        self.new_files = set()  # 本次爬取保存的文件名，重名时只有这些文件可能被改名（由 folder_lock 保护）
+        self._closed_stats = None
+
+    def get(self, url, **kwargs):
+        """经主机调度器发送GET请求；被限流(429/503)时按Retry-After或退避时间等待后重试"""
+        for attempt in range(1, throttle_attempts + 1):
+            self.scheduler.wait_turn(url)
+            response = self.session.get(url, **kwargs)
+            metrics.inc("pdf_scraper_responses_total", host=urlparse(url).netloc, code=response.status_code)
+            delay = self.scheduler.feedback(url, response.status_code, response.headers.get('Retry-After'))
+            if not delay or attempt == throttle_attempts:
+                return response
+            response.close()
+            add_debug_info(f"服务器限流 (状态码 {response.status_code})，{delay:.1f} 秒后重试: {url}",
+                           level=logging.WARNING, url=url, event="throttled")
+        return response
+
+    def connection_stats(self):
+        """统计连接复用情况: 请求数、新建连接数、复用次数"""
+        if self._closed_stats is not None:
+            return dict(self._closed_stats)
+        requests_sent = 0
+        connections = 0
+        for adapter in set(self.session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                requests_sent += pool.num_requests
+                connections += pool.num_connections
+        reused = max(requests_sent - connections, 0)
+        return {
+            "requests": requests_sent,
+            "connections": connections,
+            "reused": reused,
+            "reuse_rate": round(reused / requests_sent, 3) if requests_sent else 0.0,
+        }
+
+    def close(self):
+        """关闭会话和清单，保留最终的连接统计"""
+        if self._closed_stats is None:
+            self._closed_stats = self.connection_stats()
+            self.session.close()
+            if self.manifest is not None:
+                self.manifest.close()
+            if self.page_cache is not None:
+                self.page_cache.close()
+            if self.checkpoint is not None:
+                self.checkpoint.close()
+
+_shared_context = None
+_shared_context_lock = threading.Lock()
+
+def get_context(ctx=None):
+    """返回传入的爬取上下文；未传入时使用进程内共享的上下文"""
+    global _shared_context
+    if ctx is not None:
+        return ctx
+    with _shared_context_lock:
+        if _shared_context is None:
+            _shared_context = CrawlContext()
+        return _shared_context
+
+class Metrics:
+    """进程内的计数器、仪表和直方图，按Prometheus文本格式输出
+
+    所有指标在 metric_definitions 中声明；标签值作为键的一部分，
+    更新只在一把锁内做字典加法，不会拖慢下载线程。
+    """
+
+    def __init__(self, definitions=metric_definitions):
+        self.definitions = definitions
+        self._values = {}  # (名称, 标签) -> 数值；直方图为 [各分桶计数, 总和, 次数]
+        self._lock = threading.Lock()
+
+    def inc(self, name, value=1, **labels):
+        """计数器或仪表加上value"""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._values[key] = value
+
+    def value(self, name, **labels):
+        """返回计数器或仪表的当前值（未记录过时为0）"""
+        with self._lock:
+            return self._values.get((name, tuple(sorted(labels.items()))), 0)
+
+    def observe(self, name, value, **labels):
+        """记录一次直方图观测值"""
+        buckets = self.definitions[name][2]
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(buckets), 0.0, 0]
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    state[0][i] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextlib.contextmanager
+    def track(self, kind):
+        """统计一次页面抓取或PDF下载: 进行中的数量和耗时"""
+        self.inc("pdf_scraper_requests_in_flight", kind=kind)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.inc("pdf_scraper_requests_in_flight", -1, kind=kind)
+            self.observe("pdf_scraper_request_duration_seconds", time.monotonic() - started, kind=kind)
+
+    def render(self):
+        """按Prometheus文本格式输出所有指标"""
+        with self._lock:
+            values = {key: (value if not isinstance(value, list) else [list(value[0]), value[1], value[2]])
+                      for key, value in self._values.items()}
+        ordered = sorted(values.items(), key=lambda item: item[0])
+        lines = []
+        for name, (kind, help_text, buckets) in self.definitions.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for (metric, labels), value in ordered:
+                if metric != name:
+                    continue
+                if kind != "histogram":
+                    lines.append(f"{name}{format_labels(labels)} {value}")
+                    continue
+                counts, total, count = value
+                for bound, bucket_count in zip(buckets, counts):
+                    lines.append(f"{name}_bucket{format_labels(labels + (('le', repr(bound)),))} {bucket_count}")
+                lines.append(f"{name}_bucket{format_labels(labels + (('le', '+Inf'),))} {count}")
+                lines.append(f"{name}_sum{format_labels(labels)} {total}")
+                lines.append(f"{name}_count{format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+def format_labels(labels):
+    """把标签编码为 {name="value",...}，按文本格式转义反斜杠、引号和换行"""
+    if not labels:
+        return ""
+    parts = []
+    for name, value in labels:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        parts.append(f'{name}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+metrics = Metrics()
+
+class EventLog:
+    """固定容量的环形缓冲区，保存结构化的调试事件
+
+    每条事件带单调递增的序号，读取方用上次看到的序号作为游标获取之后的新事件；
+    缓冲区写满后覆盖最旧的事件，不会复制或重新分配列表。
+    """
+
+    def __init__(self, capacity=max_debug_entries):
+        self.capacity = capacity
+        self._buffer = [None] * capacity
+        self._seq = 0
+        self._changed = threading.Condition()
+
+    @property
+    def last_seq(self):
+        with self._changed:
+            return self._seq
+
+    def append(self, level, message, job=None, url=None, event=None):
+        """写入一条事件，返回其序号"""
+        with self._changed:
+            self._seq += 1
+            self._buffer[self._seq % self.capacity] = {
+                "seq": self._seq,
+                "ts": time.time(),
+                "level": logging.getLevelName(level),
+                "job": job,
+                "url": url,
+                "event": event,
+                "message": message,
+            }
+            self._changed.notify_all()
+            return self._seq
+
+    def read(self, cursor=0, limit=None, min_level=logging.NOTSET):
+        """返回序号大于cursor的事件（按序号排列）；已被覆盖的旧事件会被跳过"""
+        with self._changed:
+            first = max(cursor + 1, self._seq - self.capacity + 1, 1)
+            records = [self._buffer[seq % self.capacity] for seq in range(first, self._seq + 1)]
+        if min_level > logging.NOTSET:
+            records = [r for r in records if logging.getLevelName(r["level"]) >= min_level]
+        return records[:limit] if limit else records
+
+    def messages(self):
+        return [record["message"] for record in self.read()]
+
+    def wait(self, cursor, timeout):
+        """等待序号大于cursor的新事件，最多等待timeout秒"""
+        with self._changed:
+            if self._seq <= cursor:
+                self._changed.wait(timeout)
+
+    def notify(self):
+        with self._changed:
+            self._changed.notify_all()
+
+debug_events = EventLog()  # 不属于任何爬取任务的调试信息
+
+_job_local = threading.local()
+
+def current_job():
+    """返回当前线程所属的爬取任务"""
+    return getattr(_job_local, 'job', None)
+
+def bind_job(job):
+    """把当前线程绑定到爬取任务，之后的调试信息写入该任务的日志"""
+    _job_local.job = job
+
+def configure_logging(level=None):
+    """为命令行和Web入口配置日志输出（作为库导入时由调用方自行配置）"""
+    global log_level
+    if level is not None:
+        log_level = level
+    logging.basicConfig(level=log_level, format=log_format)
+
+def parse_log_level(value, default=None):
+    """把 'DEBUG'/'INFO' 或数字转换为日志级别，无法识别时返回default"""
+    if value is None or value == '':
+        return default
+    if isinstance(value, int):
+        return value
+    level = logging.getLevelName(str(value).upper())
+    return level if isinstance(level, int) else default
+
+def log_enabled(level):
+    """当前任务（或全局）的日志级别是否会记录该级别的信息"""
+    job = current_job()
+    threshold = job.log_level if job is not None and job.log_level is not None else log_level
+    return level >= threshold
+
+def add_debug_info(message, *args, level=logging.INFO, url=None, event=None):
+    """添加调试信息（写入当前任务的日志；不在任务中时写入全局日志）
+
+    低于当前日志级别的信息直接丢弃；带 args 时和 logging 一样延迟格式化，
+    高频的DEBUG信息在关闭时不产生格式化开销。
+    """
+    if not log_enabled(level):
+        return
+    if args:
+        message = message % args
+    job = current_job()
+    if job is not None:
+        job.events.append(level, message, job.id, url, event)
+    else:
+        debug_events.append(level, message, None, url, event)
+    logger.log(level, message)
+
+# exact: 年份是否可靠（来自链接文本，或URL中带有“年”、日期分隔符等），不可靠的年份不用于跳过页面
+LinkInfo = collections.namedtuple('LinkInfo', ['year', 'month', 'category', 'district', 'exact'])
+
+@functools.lru_cache(maxsize=link_cache_size)
+def parse_text_info(text):
+    """从一段文本中提取 (可信度, 年份, 月份, 类别, 区县)，可信度数值越小越可靠"""
+    year = month = None
+    rank = len(link_date_patterns)
+    for index, pattern in enumerate(link_date_patterns):
+        match = pattern.search(text)
+        if match:
+            rank = index
+            year = int(match.group('year'))
+            groups = match.groupdict()
+            if groups.get('month') and 1 <= int(groups['month']) <= 12:
+                month = int(groups['month'])
+            break
+    if month is None:
+        match = link_month_pattern.search(text)
+        if match:
+            month = int(match.group('month'))
+    # 文本中有多个类别时（如 建设工程信息价）取 link_categories 中靠前的
+    category = next((name for name in link_categories if name in text), None)
+    district = next((match.group(0) for match in link_district_pattern.finditer(text)
+                     if not match.group(0).endswith(link_district_generic)), None)
+    return rank, year, month, category, district
+
+@functools.lru_cache(maxsize=link_cache_size)
+def parse_link(url, text=''):
+    """解析链接，返回 LinkInfo(年份, 月份, 类别, 区县, 年份是否可靠)
+
+    URL只看路径（主机名、端口和查询参数中的数字不参与匹配），链接文本和URL路径中
+    可信度更高的日期优先；结果按 (url, text) 缓存，过滤和命名共用。
+    """
+    path = unquote(urlparse(url).path)
+    url_rank, url_year, url_month, url_category, _ = parse_text_info(path)
+    if not text:
+        return LinkInfo(url_year, url_month, url_category, None, url_rank < bare_year_rank)
+    text_rank, text_year, text_month, text_category, district = parse_text_info(text)
+    if text_year is not None and text_rank <= url_rank:
+        year, month, exact = text_year, text_month, True
+        if month is None and url_year in (None, year):
+            month = url_month
+    else:
+        year, month, exact = url_year, url_month, url_rank < bare_year_rank
+        if month is None and text_year in (None, year):
+            month = text_month
+    return LinkInfo(year, month, text_category or url_category, district, exact)
+
+def generate_file_name(url, original_name, text=''):
+    """根据链接的年份、月份、区县和类别生成新的文件名，如 2024年03月朝阳区信息价.pdf
+
+    与年份过滤使用同一个 parse_link(url, text) 的结果，文件名中的年份就是过滤时判断的年份。
+    """
+    info = parse_link(url, text)
+    name_part = (info.district or '') + (info.category or parse_text_info(original_name)[3] or "信息价")
+    
+    # 构建新文件名
+    if info.year and info.month:
+        new_name = f"{info.year}年{info.month:02d}月{name_part}.pdf"
+    elif info.year:
+        new_name = f"{info.year}年{name_part}.pdf"
+    else:
+        # 如果无法提取时间信息，使用原始文件名
+        new_name = original_name
+        
+    return new_name
+
+def is_in_year_range(url, text, start_year, end_year):
+    """检查链接的年份是否在指定范围内"""
+    if not start_year or not end_year:
+        return True  # 如果未指定范围，默认包含所有
+    
+    year = parse_link(url, text).year
+    if year is not None:
+        return int(start_year) <= year <= int(end_year)
+    
+    # 如果无法提取年份，默认包含
+    return True
+
+def is_page_in_year_range(url, text, start_year, end_year):
+    """检查待抓取页面是否可能在年份范围内：只有可靠的年份不在范围内时才跳过页面"""
+    info = parse_link(url, text)
+    if not start_year or not end_year or info.year is None or not info.exact:
+        return True
+    return int(start_year) <= info.year <= int(end_year)
+
+def part_file_name(url):
+    """下载中的临时文件名（隐藏文件，按URL区分）"""
+    return "." + hashlib.sha1(url.encode('utf-8')).hexdigest()[:16] + ".part"
+
+def file_sha256(path):
+    """计算本地文件的SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def disambiguate_file_name(file_name, sha256):
+    """为内容不同但重名的文件生成确定的新文件名，如 2024年03月信息价_1a2b3c4d.pdf"""
+    stem, ext = os.path.splitext(file_name)
+    return f"{stem}_{sha256[:8]}{ext or '.pdf'}"
+
+_folder_locks = {}
+_folder_locks_guard = threading.Lock()
+_shared_folder_lock = None  # 分片进程中为主进程提供的跨进程锁
+
+def folder_lock(folder):
+    """返回下载目录的锁；确定最终文件名时加锁，避免多个线程或任务重名覆盖"""
+    if _shared_folder_lock is not None:
+        return _shared_folder_lock
+    key = os.path.abspath(folder)
+    with _folder_locks_guard:
+        if key not in _folder_locks:
+            _folder_locks[key] = threading.Lock()
+        return _folder_locks[key]
+
+def store_download(part_path, folder, file_name, url, ctx, sha256, size, etag=None, last_modified=None,
+                   metadata=None):
+    """把下载完成的临时文件放到最终位置并写入清单
+
+    内容与已保存文件完全相同时只在清单中记录别名，不重复保存；
+    文件名已被内容不同的其他文件占用时加哈希后缀（见 _place_download）。
+    返回 (实际文件名, 是否为重复内容)。
+    """
+    manifest = ctx.manifest
+    with folder_lock(folder):
+        file_name, duplicate = _place_download(part_path, folder, file_name, url, manifest, sha256,
+                                               ctx.new_files)
+        if manifest is not None:
+            manifest.record(url, etag=etag, last_modified=last_modified, content_length=size,
+                            sha256=sha256, file_name=file_name, metadata=metadata)
+        # 在锁内更新文件索引，其他线程之后可能把重名的文件改名
+        if not duplicate:
+            get_catalog(folder).add(file_name, url)
+        return file_name, duplicate
+
+def _place_download(part_path, folder, file_name, url, manifest, sha256, new_files=None):
+    """确定最终文件名并移动临时文件，调用方需持有 folder_lock(folder)
+
+    内容不同的文件重名时，已有的文件保留原文件名，新文件加哈希后缀；只有两个文件都是
+    本次爬取保存的（在 new_files 中）时才按URL排序，排序靠前的使用原文件名，结果与下载完成的
+    先后顺序无关。以前保存的文件不会被改名。
+    """
+    if new_files is None:
+        new_files = set()
+    if manifest is not None:
+        existing = manifest.find_by_hash(sha256)
+        if existing and os.path.exists(os.path.join(folder, existing)):
+            os.remove(part_path)
+            return existing, True
+    
+    previous = manifest.get(url) if manifest is not None else None
+    previous_name = previous["file_name"] if previous else None
+    target = os.path.join(folder, file_name)
+    if os.path.exists(target) and file_name == previous_name:
+        # 同一URL重新下载的新版本覆盖自己原来的文件；其他URL也指向这个文件（内容相同的别名）时，
+        # 旧内容先改用带哈希后缀的文件名保留，别名随之指向新文件名
+        alias = manifest.alias_of_file(file_name, url)
+        if alias is not None and previous["sha256"] and previous["sha256"] != sha256:
+            moved = _move_aside(folder, file_name, previous["sha256"], manifest, alias)
+            new_files.discard(file_name)
+            new_files.add(moved)
+    elif os.path.exists(target):
+        known_hash = manifest.hash_of_file(file_name) if manifest is not None else None
+        if known_hash is None:
+            # 清单之外的旧文件：长度不同则内容必然不同，长度相同再比较哈希
+            same_size = os.path.getsize(target) == os.path.getsize(part_path)
+            known_hash = file_sha256(target) if same_size else None
+        if known_hash == sha256:
+            os.remove(part_path)
+            return file_name, True
+        owner = manifest.owner_of_file(file_name) if manifest is not None else None
+        if file_name in new_files and owner is not None and known_hash is not None and url < owner:
+            moved = _move_aside(folder, file_name, known_hash, manifest, owner)
+            new_files.add(moved)
+        else:
+            file_name = disambiguate_file_name(file_name, sha256)
+            target = os.path.join(folder, file_name)
+    
+    os.replace(part_path, target)
+    new_files.add(file_name)
+    return file_name, False
+
+def _move_aside(folder, file_name, sha256, manifest, source_url):
+    """把已保存的文件改用带哈希后缀的文件名，更新清单和文件索引，返回新文件名"""
+    moved = disambiguate_file_name(file_name, sha256)
+    os.replace(os.path.join(folder, file_name), os.path.join(folder, moved))
+    manifest.rename_file(file_name, moved)
+    get_catalog(folder).rename(file_name, moved, source_url)
+    add_debug_info(f"文件改名: {file_name} -> {moved}", url=source_url, event="renamed")
+    return moved
+
+def conditional_headers(entry, folder):
+    """根据清单记录构造条件请求头；本地文件缺失时返回空字典"""
+    if not entry or not entry.get("file_name"):
+        return {}
+    if not os.path.exists(os.path.join(folder, entry["file_name"])):
+        return {}
+    headers = {}
+    if entry.get("etag"):
+        headers['If-None-Match'] = entry["etag"]
+    if entry.get("last_modified"):
+        headers['If-Modified-Since'] = entry["last_modified"]
+    return headers
+
+class IncompleteDownloadError(Exception):
+    """收到的字节数少于Content-Length，临时文件保留用于续传"""
+
+# 传输中断时可以续传的异常
+resumable_errors = (
+    requests.exceptions.ConnectionError,
+    requests.exceptions.ChunkedEncodingError,
+    requests.exceptions.Timeout,
+    IncompleteDownloadError,
+)
+
+def read_part_meta(part_path):
+    """读取临时文件对应的校验信息（ETag、Last-Modified、总长度）"""
+    try:
+        with open(part_path + ".json", 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def write_part_meta(part_path, meta):
+    with open(part_path + ".json", 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+
+def remove_part(part_path):
+    """删除临时文件及其校验信息"""
+    for path in (part_path, part_path + ".json"):
+        if os.path.exists(path):
+            os.remove(path)
+
+class PdfInspector:
+    """边下载边检查PDF: 开头的%PDF-文件头和结尾的%%EOF
+
+    可选地顺带统计页面对象数、提取文档信息中的标题和创建日期；只保留
+    开头、结尾和跨块边界的少量字节，不把整个文件读入内存。标题和创建日期只取
+    trailer中 /Info 引用的对象（书签、注释中的 /Title 不算）。压缩在对象流中的
+    页面和文档信息无法识别，此时对应字段为None。
+    """
+
+    def __init__(self, extract_metadata=True):
+        self.extract_metadata = extract_metadata
+        self.head = b''
+        self.tail = b''
+        self.pages = 0
+        self.title = None
+        self.created = None
+        self._carry = b''
+        self._object = None  # 当前所在的对象 (编号, 版本)
+        self._info = {}  # 对象 (编号, 版本) -> [标题, 创建日期]，trailer在文件末尾，先记下各对象的值
+        self._info_ref = None
+
+    def feed(self, chunk):
+        if len(self.head) < pdf_header_window:
+            self.head += chunk[:pdf_header_window - len(self.head)]
+        self.tail = (self.tail + chunk[-pdf_trailer_window:])[-pdf_trailer_window:]
+        if self.extract_metadata:
+            self._scan(self._carry + chunk, final=False)
+
+    def finish(self):
+        """数据全部输入后调用，处理最后留下的字节"""
+        if self.extract_metadata:
+            self._scan(self._carry, final=True)
+
+    def _scan(self, data, final):
+        # 结尾附近的匹配可能被截断，留到下一块和后续数据一起匹配
+        limit = len(data) if final else len(data) - pdf_scan_margin
+        cut = max(limit, 0)
+        consumed = 0
+        for match in pdf_token_pattern.finditer(data):
+            if match.end() > limit:
+                cut = match.start()
+                break
+            consumed = match.end()
+            if match.group(1) is not None or match.group(2) is not None:
+                values = self._info.setdefault(self._object_at(data, match.start()), [None, None])
+                if match.group(1) is not None and values[0] is None:
+                    values[0] = decode_pdf_string(match.group(1))
+                elif match.group(2) is not None and values[1] is None:
+                    values[1] = format_pdf_date(match.group(2))
+            elif match.group(3) is not None:
+                self._info_ref = (int(match.group(3)), int(match.group(4)))  # 增量更新时以最后一个为准
+            else:
+                self.pages += 1
+        if final:
+            self.title, self.created = self._info.get(self._info_ref, (None, None))
+        else:
+            # 块末尾可能是下一个对象开始（12 0 obj）的一部分，留到下一块，保证编号和obj在同一段数据中
+            cut = max(cut - len(pdf_object_tail_pattern.search(data, max(cut - 40, 0), cut).group()), consumed)
+            self._object = self._object_at(data, cut)
+        self._carry = b'' if final else data[cut:]
+
+    def _object_at(self, data, pos):
+        """返回 data[pos] 所在的对象 (编号, 版本)，对象在之前的块中开始时沿用上一块的结果"""
+        end = pos
+        while True:
+            end = data.rfind(b'obj', 0, end)
+            if end < 0:
+                return self._object
+            match = pdf_object_number_pattern.search(data, max(end - 32, 0), end)
+            if match:
+                return int(match.group(1)), int(match.group(2))
+
+    def header_ok(self):
+        return b'%PDF-' in self.head
+
+    def trailer_ok(self):
+        return b'%%EOF' in self.tail
+
+    def metadata(self):
+        return {"pages": self.pages or None, "title": self.title, "created": self.created}
+
+def decode_pdf_string(token):
+    """解码PDF字符串 (...) 或 <...>；带BOM的按UTF-16解码"""
+    if token.startswith(b'<'):
+        digits = re.sub(rb'\s', b'', token[1:-1])
+        try:
+            raw = bytes.fromhex((digits + b'0' * (len(digits) % 2)).decode('ascii'))
+        except ValueError:
+            return None
+    else:
+        raw = re.sub(rb'\\([0-7]{1,3}|.)', _unescape_pdf_char, token[1:-1], flags=re.S)
+    if raw.startswith(codecs.BOM_UTF16_BE):
+        text = raw[2:].decode('utf-16-be', errors='replace')
+    else:
+        try:
+            text = raw.decode('utf-8')
+        except UnicodeDecodeError:
+            text = raw.decode('latin-1')
+    return text.strip('\x00 ').strip() or None
+
+def _unescape_pdf_char(match):
+    value = match.group(1)
+    if value[:1].isdigit():
+        return bytes([int(value, 8) & 0xFF])
+    return {b'n': b'\n', b'r': b'\r', b't': b'\t', b'b': b'\b', b'f': b'\f'}.get(value, value)
+
+def format_pdf_date(digits):
+    """把 D:20240315... 中的数字转换为 2024-03-15（缺少的部分省略）"""
+    digits = digits.decode('ascii')
+    parts = [digits[0:4], digits[4:6], digits[6:8]]
+    return "-".join(part for part in parts if len(part) == 2 or len(part) == 4)
+
+def parse_content_range(value):
+    """解析 Content-Range: bytes start-end/total，返回 (start, total)；total未知时为None"""
+    match = re.match(r'bytes\s+(\d+)-\d+/(\d+|\*)', value or '')
+    if not match:
+        return None, None
+    total = match.group(2)
+    return int(match.group(1)), (int(total) if total != '*' else None)
+
+def log_transfer_limit(reason, url, ctx, size=None):
+    """记录因字节预算或磁盘空间不足而没有下载（或中途停止）的文件"""
+    stopped = "跳过" if size is not None else "停止下载，已下载的部分保留以便续传"
+    if reason == 'budget':
+        add_debug_info(f"超出下载字节预算（{ctx.transfer.byte_budget} 字节），{stopped}: {url}",
+                       level=logging.WARNING, url=url, event="budget")
+    else:
+        needed = f"需要 {size} 字节，" if size else ""
+        add_debug_info(f"磁盘空闲空间不足（{needed}至少保留 {ctx.transfer.min_free_space} 字节），{stopped}: {url}",
+                       level=logging.WARNING, url=url, event="disk_full")
+
+def fetch_pdf_to_file(url, folder, part_path, entry, ctx, text=''):
+    """发送一次下载请求并写入临时文件，返回 (结果, 文件名, 是否重复内容)
+
+    结果为 'saved'、'unchanged'、'skipped'、'invalid'（不是有效的PDF）、'retry'、
+    'budget'（超出字节预算）、'disk_full'（磁盘空间不足）之一。传输中断时抛出
+    resumable_errors 中的异常，临时文件保留，下次请求用Range从断点继续。
+    """
+    manifest = ctx.manifest
+    request_headers = dict(pdf_headers)
+    request_headers.update(conditional_headers(entry, folder))
+    
+    # 有未完成的临时文件时从断点继续，If-Range保证服务器上的文件没有变化
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    part_meta = read_part_meta(part_path) if offset else None
+    if part_meta is not None:
+        request_headers['Range'] = f'bytes={offset}-'
+        validator = part_meta.get('etag') or part_meta.get('last_modified')
+        if validator:
+            request_headers['If-Range'] = validator
+        add_debug_info(f"从第 {offset} 字节继续下载: {url}", url=url, event="resume")
+    else:
+        offset = 0
+    
+    # 通过共享会话发送请求，复用已建立的连接
+    response = ctx.get(url, stream=True, headers=request_headers, timeout=request_timeout)
+    
+    # 确保响应被关闭，连接才能回到连接池
+    with response:
+        if response.status_code == 304:
+            add_debug_info("文件未变化，跳过: %s", entry['file_name'], level=logging.DEBUG, url=url, event="unchanged")
+            remove_part(part_path)
+            manifest.touch(url)
+            return 'unchanged', entry['file_name'], False
+        
+        if response.status_code == 416:
+            add_debug_info(f"续传位置无效，重新下载: {url}", level=logging.WARNING, url=url, event="resume")
+            remove_part(part_path)
+            return 'retry', None, False
+        
+        # 检查是否为PDF
+        content_type = response.headers.get('Content-Type', '')
+        add_debug_info("Content-Type: %s", content_type, level=logging.DEBUG, url=url)
+        
+        # 检查内容长度
+        content_length = int(response.headers.get('Content-Length', 0))
+        add_debug_info("内容长度: %d 字节", content_length, level=logging.DEBUG, url=url)
+        
+        if response.status_code == 206:
+            start, total_length = parse_content_range(response.headers.get('Content-Range'))
+            if start != offset:
+                add_debug_info(f"续传范围不匹配，重新下载: {url}", level=logging.WARNING, url=url, event="resume")
+                remove_part(part_path)
+                return 'retry', None, False
+        elif response.status_code == 200:
+            # 服务器不支持Range或文件已变化时返回完整内容
+            offset = 0
+            total_length = content_length or None
+        else:
+            add_debug_info(f"下载失败, 状态码: {response.status_code}, URL: {url}",
+                           level=logging.WARNING, url=url, event="download_failed")
+            return 'skipped', None, False
+        
+        # 从URL中提取文件名
+        original_file_name = url.split('/')[-1]
+        
+        # 确保文件名以.pdf结尾
+        if not original_file_name.lower().endswith('.pdf'):
+            if 'application/pdf' in content_type:
+                original_file_name += '.pdf'
+            else:
+                add_debug_info(f"忽略非PDF文件: {url}", url=url, event="skipped")
+                return 'skipped', None, False
+        
+        # 生成新文件名
+        file_name = generate_file_name(url, original_file_name, text)
+        add_debug_info("文件将被保存为: %s", file_name, level=logging.DEBUG, url=url)
+        
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        
+        # 服务器不支持条件请求时，长度与清单一致且本地文件完整则视为未变化
+        previous_path = os.path.join(folder, entry["file_name"]) if entry and entry.get("file_name") else None
+        if (offset == 0 and previous_path and not (etag or last_modified) and content_length
+                and content_length == entry.get("content_length")
+                and os.path.exists(previous_path)
+                and os.path.getsize(previous_path) == content_length):
+            add_debug_info("文件长度未变化，跳过: %s", entry['file_name'], level=logging.DEBUG, url=url, event="unchanged")
+            remove_part(part_path)
+            manifest.touch(url)
+            return 'unchanged', entry['file_name'], False
+        
+        # 按Content-Length预留字节预算和磁盘空间，不够时不开始写入
+        reserved = total_length - offset if total_length is not None else 0
+        reason = ctx.transfer.reserve(reserved)
+        if reason is not None:
+            log_transfer_limit(reason, url, ctx, reserved)
+            return reason, None, False
+        
+        try:
+            chunks = response.iter_content(chunk_size=ctx.chunk_size)
+            inspector = PdfInspector(ctx.pdf_metadata)
+            first_bytes = b''
+            
+            # 写入临时文件，同时计算内容哈希；续传时先把已下载部分计入哈希
+            digest = hashlib.sha256()
+            if offset:
+                with open(part_path, 'rb') as f:
+                    for block in iter(lambda: f.read(1024 * 1024), b''):
+                        digest.update(block)
+                        inspector.feed(block)
+            else:
+                # 先检查第一块的文件头，以PDF类型返回的错误页面不写入磁盘
+                first_bytes = next(chunks, b'')
+                inspector.feed(first_bytes)
+                if not inspector.header_ok():
+                    add_debug_info(f"内容不是PDF（缺少%PDF文件头）: {url}", level=logging.WARNING, url=url, event="invalid")
+                    remove_part(part_path)
+                    return 'invalid', None, False
+                write_part_meta(part_path, {"etag": etag, "last_modified": last_modified, "total": total_length})
+            
+            size = offset
+            with open(part_path, 'ab' if offset else 'wb') as f:
+                try:
+                    for chunk in itertools.chain((first_bytes,), chunks):
+                        if chunk:
+                            if chunk is not first_bytes:
+                                inspector.feed(chunk)
+                            digest.update(chunk)
+                            f.write(chunk)
+                            size += len(chunk)
+                            # 按带宽上限等待；超出预算或磁盘空间不足时停止，临时文件保留以便以后续传
+                            used = min(len(chunk), reserved)
+                            reserved -= used
+                            reason = ctx.transfer.transfer(len(chunk), used)
+                            if reason is not None:
+                                log_transfer_limit(reason, url, ctx)
+                                return reason, None, False
+                finally:
+                    metrics.inc("pdf_scraper_bytes_transferred_total", size - offset, kind="pdf")
+        finally:
+            ctx.transfer.release(reserved)
+    
+    if total_length is not None and size != total_length:
+        raise IncompleteDownloadError(f"下载不完整: 已收到 {size} / {total_length} 字节")
+    
+    inspector.finish()
+    if not inspector.trailer_ok():
+        remove_part(part_path)
+        # 长度已确认时重新下载也一样，不再重试；长度未知时可能是连接提前关闭
+        if total_length is not None:
+            add_debug_info(f"PDF不完整或已损坏（缺少%%EOF）: {url}", level=logging.WARNING, url=url, event="invalid")
+            return 'invalid', None, False
+        add_debug_info(f"PDF结尾缺少%%EOF，可能被截断，重新下载: {url}", level=logging.WARNING, url=url, event="resume")
+        return 'retry', None, False
+    metadata = inspector.metadata()
+    add_debug_info("PDF信息: %s 页, 标题: %s, 创建日期: %s", metadata["pages"], metadata["title"],
+                   metadata["created"], level=logging.DEBUG, url=url)
+    
+    # 完整后原子地移动到最终文件名
+    os.remove(part_path + ".json")
+    file_name, duplicate = store_download(part_path, folder, file_name, url, ctx,
+                                          digest.hexdigest(), size, etag, last_modified, metadata)
+    return 'saved', file_name, duplicate
+
+def download_pdf(url, folder, update_progress=None, ctx=None, text=''):
+    """下载PDF文件并保存到指定文件夹，传输中断时自动续传；text 为链接文本，用于生成文件名"""
+    try:
+        add_debug_info("尝试下载: %s", url, level=logging.DEBUG, url=url)
+        ctx = get_context(ctx)
+        manifest = ctx.manifest
+        
+        # 增量模式下带上清单中的ETag/Last-Modified
+        entry = manifest.get(url) if manifest is not None and ctx.incremental else None
+        part_path = os.path.join(folder, part_file_name(url))
+        
+        result, file_name, duplicate = 'retry', None, False
+        if ctx.transfer.exhausted():
+            # 预算已用完时不再发送请求
+            add_debug_info("下载字节预算已用完，跳过: %s", url, level=logging.DEBUG, url=url, event="budget")
+            result = 'budget'
+        else:
+            # 整个传输过程占用主机的并发名额
+            with ctx.scheduler.slot(url), metrics.track("pdf"):
+                for attempt in range(1, download_attempts + 1):
+                    try:
+                        result, file_name, duplicate = fetch_pdf_to_file(url, folder, part_path, entry, ctx, text)
+                    except resumable_errors as e:
+                        if attempt == download_attempts:
+                            raise
+                        add_debug_info(f"传输中断 (第 {attempt} 次): {str(e)}, 将续传: {url}",
+                                       level=logging.WARNING, url=url, event="resume")
+                        continue
+                    if result != 'retry':
+                        break
+        
+        if result == 'saved':
+            metrics.inc("pdf_scraper_pdfs_downloaded_total")
+            if duplicate:
+                metrics.inc("pdf_scraper_pdf_duplicates_total")
+                add_debug_info(f"内容与已保存文件相同，不再重复保存: {file_name}", url=url, event="duplicate")
+            else:
+                add_debug_info(f"成功下载: {file_name}", url=url, event="downloaded")
+            if update_progress:
+                update_progress(success=True, filename=file_name, duplicate=duplicate)
+            return file_name
+        
+        metrics.inc("pdf_scraper_pdfs_skipped_total", reason=result)
+        if update_progress:
+            if result == 'unchanged':
+                update_progress(unchanged=True)
+            else:
+                update_progress(skipped=True)
+        return None
+    except Exception as e:
+        add_debug_info(f"下载过程中出错: {str(e)}, URL: {url}", level=logging.ERROR, url=url, event="download_failed")
+        metrics.inc("pdf_scraper_pdfs_skipped_total", reason="error")
+        if update_progress:
+            update_progress(skipped=True)
+        return None
+
+def normalize_charset(name):
+    """规范化编码名称，未知编码返回None"""
+    name = charset_aliases.get(name.lower(), name.lower())
+    try:
+        codecs.lookup(name)
+    except LookupError:
+        return None
+    return name
+
+def detect_charset(content_type, content):
+    """依次根据BOM、响应头、meta标签确定页面编码，只确定一次"""
+    if content.startswith(codecs.BOM_UTF8):
+        return 'utf-8'
+    
+    match = header_charset_pattern.search(content_type or '')
+    if match:
+        charset = normalize_charset(match.group(1))
+        if charset:
+            return charset
+    
+    match = meta_charset_pattern.search(content[:charset_sniff_bytes])
+    if match:
+        charset = normalize_charset(match.group(1).decode('ascii', 'ignore'))
+        if charset:
+            return charset
+    
+    # 未声明编码: 页面开头是合法UTF-8则按UTF-8处理，否则按GB18030处理
+    try:
+        codecs.getincrementaldecoder('utf-8')().decode(content[:utf8_sniff_bytes], final=False)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        return 'gb18030'
+
+def extract_links(content, charset):
+    """只解析页面中的标题和<a>标签，返回 (标题, [(href, 链接文本)])
+
+    安装了lxml时直接解析字节内容，否则用SoupStrainer只构建<a>和<title>节点。
+    """
+    if lxml_html is not None:
+        parser = lxml_html.HTMLParser(encoding=charset)
+        try:
+            doc = lxml_html.document_fromstring(content, parser=parser)
+        except Exception:  # 空文档或无法解析
+            return "", []
+        title = doc.findtext('.//title') or ""
+        anchors = [(a.get('href'), a.text_content().strip()) for a in doc.iter('a')]
+        return title.strip(), anchors
+    
+    html_content = content.decode(charset, errors='replace')
+    soup = BeautifulSoup(html_content, 'html.parser', parse_only=SoupStrainer(['a', 'title']))
+    title = soup.title.string if soup.title and soup.title.string else ""
+    anchors = [(a.get('href'), a.get_text().strip()) for a in soup.find_all('a')]
+    return title.strip(), anchors
+
+def load_page_links(url, depth, ctx):
+    """取得页面的 (标题, 链接列表)，获取失败时返回None
+
+    启用了页面缓存时，新鲜的缓存直接使用；过期的缓存发送条件请求，
+    服务器返回304时沿用缓存的链接，不再解析页面。
+    """
+    cache = ctx.page_cache
+    entry = cache.get(url) if cache is not None else None
+    if entry is not None and cache.is_fresh(entry, depth):
+        metrics.inc("pdf_scraper_page_cache_total", result="hit")
+        add_debug_info("使用缓存的页面: %s", url, level=logging.DEBUG, url=url, event="cache_hit")
+        return cache.page_links(entry)
+    
+    request_headers = dict(page_headers)
+    if entry is not None:
+        if entry["etag"]:
+            request_headers['If-None-Match'] = entry["etag"]
+        if entry["last_modified"]:
+            request_headers['If-Modified-Since'] = entry["last_modified"]
+    with ctx.scheduler.slot(url), metrics.track("page"):
+        response = ctx.get(url, headers=request_headers, timeout=request_timeout)
+    metrics.inc("pdf_scraper_pages_fetched_total")
+    metrics.inc("pdf_scraper_bytes_transferred_total", len(response.content), kind="page")
+    add_debug_info("HTTP状态码: %d", response.status_code, level=logging.DEBUG, url=url)
+    
+    if response.status_code == 304 and entry is not None:
+        cache.refresh(url, response.headers)
+        metrics.inc("pdf_scraper_page_cache_total", result="revalidated")
+        add_debug_info("页面未变化，使用缓存: %s", url, level=logging.DEBUG, url=url, event="cache_hit")
+        return cache.page_links(entry)
+    
+    if response.status_code != 200:
+        add_debug_info(f"获取页面失败, 状态码: {response.status_code}, URL: {url}",
+                       level=logging.WARNING, url=url, event="page_failed")
+        return None
+    
+    # 确定编码后只解析一次
+    content_type = response.headers.get('Content-Type', '')
+    charset = detect_charset(content_type, response.content)
+    add_debug_info("Content-Type: %s, 编码: %s", content_type, charset, level=logging.DEBUG, url=url)
+    
+    parse_started = time.monotonic()
+    title, links = extract_links(response.content, charset)
+    metrics.observe("pdf_scraper_parse_duration_seconds", time.monotonic() - parse_started)
+    if cache is not None:
+        cache.store(url, response.headers, response.content, charset, title, links)
+        metrics.inc("pdf_scraper_page_cache_total", result="miss")
+    return title, links
+
+def fetch_page_links(url, start_year=None, end_year=None, depth=0, ctx=None):
+    """抓取单个页面，返回 (PDF链接列表[(url, 链接文本)], 候选子页面列表)；页面获取失败时PDF链接列表为None"""
+    add_debug_info(f"正在检查页面 (深度 {depth}): {url}", url=url, event="page")
+    
+    try:
+        ctx = get_context(ctx)
+        page = load_page_links(url, depth, ctx)
+        
+        if page is not None:
+            title, links = page
+            add_debug_info("页面标题: %s", title or '无标题', level=logging.DEBUG, url=url)
+            add_debug_info("找到链接数量: %d", len(links), level=logging.DEBUG, url=url)
+            
+            pdf_links = []
+            potential_subpages = []
+            filtered = 0
+            verbose = log_enabled(logging.DEBUG)  # 每个链接的信息只在DEBUG级别记录
+            
+            # 优先搜索直接的PDF链接
+            for href, link_text in links:
+                if not href:
+                    continue
+                
+                # 转为完整URL，去掉#片段（同一文件的不同位置）
+                full_url = urljoin(url, href).partition('#')[0]
+                
+                # 检查链接的路径是否以.pdf结尾
+                if full_url.partition('?')[0].lower().endswith('.pdf'):
+                    # 检查是否在年份范围内
+                    if is_in_year_range(full_url, link_text, start_year, end_year):
+                        if verbose:
+                            add_debug_info("找到PDF链接: %s", full_url, level=logging.DEBUG, url=full_url, event="pdf_found")
+                        pdf_links.append((full_url, link_text))
+                    else:
+                        filtered += 1
+                        if verbose:
+                            add_debug_info("PDF链接不在指定年份范围内，已忽略: %s", full_url,
+                                           level=logging.DEBUG, url=full_url, event="pdf_filtered")
+                
+                # 收集可能包含PDF的页面链接（PDF本身不作为页面解析）
+                elif any(keyword in link_text for keyword in subpage_keywords):
+                    # 链接中的年份可靠且不在范围内的页面不再抓取
+                    if not is_page_in_year_range(full_url, link_text, start_year, end_year):
+                        if verbose:
+                            add_debug_info("页面不在指定年份范围内，已跳过: %s -> %s", link_text, full_url,
+                                           level=logging.DEBUG, url=full_url, event="subpage_filtered")
+                        continue
+                    potential_subpages.append((full_url, link_text))
+                    if verbose:
+                        add_debug_info("找到潜在内容页面: %s -> %s", link_text, full_url,
+                                       level=logging.DEBUG, url=full_url, event="subpage_found")
+            
+            metrics.inc("pdf_scraper_pdfs_found_total", len(pdf_links))
+            if filtered:
+                metrics.inc("pdf_scraper_pdfs_skipped_total", filtered, reason="year")
+            return pdf_links, potential_subpages
+        else:
+            return None, []
+    except Exception as e:
+        add_debug_info(f"获取PDF链接过程中出错: {str(e)}, URL: {url}", level=logging.ERROR, url=url, event="page_failed")
+        return None, []
+
+def url_pattern(url):
+    """URL所在目录的模式（数字替换为#），如 /2024/03/index.html -> /#/#/，用于统计同类页面的PDF产出"""
+    return url_digits_pattern.sub('#', urlparse(url).path.rsplit('/', 1)[0]) + '/'
+
+class LinkScorer:
+    """给待抓取页面打分: 链接文字、链接中的年月、深度，以及同类URL已抓取页面的PDF产出"""
+
+    def __init__(self, start_year=None, end_year=None):
+        self.start_year = start_year
+        self.end_year = end_year
+        self._lock = threading.Lock()
+        self._yields = {}  # URL模式 -> [已抓取页面数, 找到的PDF数]
+
+    def score(self, url, text, depth):
+        score = max((value for keyword, value in subpage_keyword_scores.items() if keyword in text), default=0.0)
+        info = parse_link(url, text)
+        if info.year is not None and self.start_year and self.end_year:
+            # 可靠年份在范围外的页面已被 is_page_in_year_range 过滤，剩下的只可能是单独的年份
+            if int(self.start_year) <= info.year <= int(self.end_year):
+                score += year_match_score + (month_match_score if info.month else 0.0)
+            else:
+                score -= year_mismatch_penalty
+        score -= depth * depth_penalty
+        with self._lock:
+            pages, pdfs = self._yields.get(url_pattern(url), (0, 0))
+        if pages:
+            score += min(pdfs / pages, 4) * yield_score
+            if pages >= barren_pages and not pdfs:
+                score -= barren_penalty
+        return score
+
+    def record(self, url, pdf_count):
+        """记录抓取一个页面找到的PDF数"""
+        with self._lock:
+            counts = self._yields.setdefault(url_pattern(url), [0, 0])
+            counts[0] += 1
+            counts[1] += pdf_count
+
+class CrawlFrontier:
+    """按得分排序的待抓取页面队列（得分相同时先进先出），负责去重、跟踪未完成的页面数和页面数上限"""
+
+    def __init__(self, max_pages=0):
+        self._queue = []  # 堆: (-得分, 序号, url, 深度)
+        self._counter = 0
+        self._seen = FingerprintSet()  # 按规范化的URL去重
+        self._pending = 0  # 队列中和正在抓取的页面数
+        self._popped = 0
+        self.max_pages = max_pages
+        self.exhausted = False  # 达到页面数上限后不再接受新页面
+        self._cond = threading.Condition()
+
+    def push(self, url, depth, score=0.0):
+        """加入待抓取页面，已见过的URL（或已达到页面数上限）返回False"""
+        with self._cond:
+            if self.exhausted or not self._seen.add(url):
+                return False
+            self._counter += 1
+            heapq.heappush(self._queue, (-score, self._counter, url, depth))
+            self._pending += 1
+            self._cond.notify()
+            return True
+
+    def mark_seen(self, seen):
+        """把已抓取过的页面（从检查点恢复的 FingerprintSet）标记为见过，不再加入队列"""
+        with self._cond:
+            for fingerprint in seen.fingerprints():
+                self._seen.add_fingerprint(fingerprint)
+
+    def pop(self):
+        """取出得分最高的页面；所有页面都处理完或达到页面数上限时返回None"""
+        with self._cond:
+            if self.max_pages and self._popped >= self.max_pages and not self.exhausted:
+                self.exhausted = True
+                self._pending -= len(self._queue)
+                self._queue.clear()
+                add_debug_info(f"已达到页面数上限 ({self.max_pages})，不再抓取新页面", level=logging.WARNING)
+                self._cond.notify_all()
+            while not self._queue:
+                if self._pending == 0:
+                    return None
+                self._cond.wait()
+            self._popped += 1
+            _, _, url, depth = heapq.heappop(self._queue)
+            return url, depth
+
+    def task_done(self):
+        """标记一个页面处理完毕"""
+        with self._cond:
+            self._pending -= 1
+            if self._pending == 0:
+                self._cond.notify_all()
+
+    def visited_count(self):
+        with self._cond:
+            return len(self._seen)
+
+def xml_local_name(tag):
+    """去掉命名空间，如 {http://www.sitemaps.org/schemas/sitemap/0.9}loc -> loc"""
+    return tag.rsplit('}', 1)[-1] if isinstance(tag, str) else ''
+
+def iter_feed_entries(url, ctx):
+    """流式解析站点地图（含索引和gzip压缩）或RSS/Atom订阅源
+
+    逐条产生 (类型, URL, 标题)，类型为 'sitemap'（子站点地图）或 'link'。
+    不把整个文件读入内存；格式错误时保留已解析出的条目。
+    """
+    with ctx.scheduler.slot(url), metrics.track("page"):
+        response = ctx.get(url, stream=True, timeout=request_timeout)
+    with response:
+        if response.status_code != 200:
+            add_debug_info("站点地图不存在或无法访问 (状态码 %d): %s", response.status_code, url,
+                           level=logging.DEBUG, url=url)
+            return
+        response.raw.decode_content = True  # 解开Content-Encoding: gzip
+        response.raw.auto_close = False  # 读完后由 with response 关闭，BufferedReader 才能读到文件末尾
+        source = io.BufferedReader(response.raw)
+        # sitemap.xml.gz 本身是gzip文件：按文件头判断，URL后缀和Content-Type都不可靠
+        if source.peek(2)[:2] == gzip_magic:
+            source = gzip.GzipFile(fileobj=source)
+        try:
+            for _, element in ElementTree.iterparse(source, events=('end',)):
+                name = xml_local_name(element.tag)
+                if name not in ('sitemap', 'url', 'item', 'entry'):
+                    continue
+                children = {xml_local_name(child.tag): child for child in element}
+                title = (children['title'].text or '').strip() if 'title' in children else ''
+                if name in ('sitemap', 'url'):
+                    loc = children.get('loc')
+                    if loc is not None and loc.text:
+                        yield ('sitemap' if name == 'sitemap' else 'link'), loc.text.strip(), ''
+                elif name == 'item':  # RSS
+                    link = children.get('link')
+                    if link is not None and link.text:
+                        yield 'link', urljoin(url, link.text.strip()), title
+                    enclosure = children.get('enclosure')
+                    if enclosure is not None and enclosure.get('url'):
+                        yield 'link', urljoin(url, enclosure.get('url')), title
+                else:  # Atom
+                    for child in element:
+                        if xml_local_name(child.tag) == 'link' and child.get('href'):
+                            yield 'link', urljoin(url, child.get('href')), title
+                element.clear()
+        except (ElementTree.ParseError, EOFError, OSError) as e:
+            add_debug_info(f"解析站点地图出错: {str(e)}, URL: {url}", level=logging.WARNING, url=url, event="sitemap")
+
+def find_feed_sources(base_url, ctx):
+    """返回要读取的站点地图和订阅源: robots.txt中的Sitemap、默认路径、起始页面中声明的RSS/Atom"""
+    parsed = urlparse(base_url)
+    root = f"{parsed.scheme}://{parsed.netloc}"
+    sources = []
+    try:
+        with ctx.scheduler.slot(root + "/robots.txt"):
+            response = ctx.get(root + "/robots.txt", timeout=request_timeout)
+        if response.status_code == 200:
+            for line in response.text.splitlines():
+                name, _, value = line.partition(':')
+                if name.strip().lower() == 'sitemap' and value.strip():
+                    sources.append(urljoin(root, value.strip()))
+    except requests.RequestException as e:
+        add_debug_info(f"读取robots.txt失败: {str(e)}", level=logging.WARNING, url=root + "/robots.txt", event="sitemap")
+    if not sources:
+        sources.extend(root + path for path in sitemap_paths)
+    try:
+        with ctx.scheduler.slot(base_url):
+            response = ctx.get(base_url, headers=page_headers, timeout=request_timeout)
+        if response.status_code == 200:
+            for tag in feed_link_pattern.findall(response.content):
+                match = feed_href_pattern.search(tag)
+                if match:
+                    sources.append(urljoin(base_url, match.group(1).decode('ascii', 'ignore')))
+    except requests.RequestException as e:
+        add_debug_info(f"获取起始页面失败: {str(e)}", level=logging.WARNING, url=base_url, event="sitemap")
+    return list(dict.fromkeys(sources))
+
+def discover_from_sitemaps(base_url, start_year=None, end_year=None, ctx=None):
+    """从站点地图和订阅源中查找PDF和内容页面，返回 (PDF链接列表[(url, 标题)], 内容页面列表)
+
+    内容页面只保留与起始页面同一主机、同一目录下，年份在范围内，并且标题含关键词，
+    或者URL中有年份且是列表页的形状（站点地图的条目没有标题，带日期的新闻文章不算）；
+    站点地图通常列出全站页面，不加筛选会比遍历网页抓取得更多。页面超过上限时按
+    LinkScorer 的得分取前面的。
+    """
+    ctx = get_context(ctx)
+    parsed = urlparse(base_url)
+    prefix = parsed.path.rsplit('/', 1)[0] + '/'
+    pending = collections.deque(find_feed_sources(base_url, ctx))
+    seen_sources = set(pending)
+    pdf_links = {}
+    pages = {}
+    files_read = 0
+    while pending and files_read < max_sitemap_files:
+        source = pending.popleft()
+        files_read += 1
+        try:
+            for kind, link, title in iter_feed_entries(source, ctx):
+                if kind == 'sitemap':
+                    if link not in seen_sources:
+                        seen_sources.add(link)
+                        pending.append(link)
+                    continue
+                link_parsed = urlparse(link)
+                if link_parsed.path.lower().endswith('.pdf'):
+                    if is_in_year_range(link, title, start_year, end_year):
+                        pdf_links.setdefault(link, title)
+                elif (link_parsed.netloc == parsed.netloc and link_parsed.path.startswith(prefix)
+                        and (any(k in title for k in subpage_keywords)
+                             or (parse_link(link, title).year and listing_page_pattern.search(link_parsed.path)))
+                        and is_page_in_year_range(link, title, start_year, end_year)):
+                    pages.setdefault(link, title)
+        except requests.RequestException as e:
+            add_debug_info(f"获取站点地图失败: {str(e)}, URL: {source}", level=logging.WARNING, url=source, event="sitemap")
+    scorer = LinkScorer(start_year, end_year)
+    page_list = sorted(pages, key=lambda link: -scorer.score(link, pages[link], 0))
+    if len(page_list) > max_sitemap_pages:
+        add_debug_info(f"站点地图中的内容页面过多，只检查前 {max_sitemap_pages} 个（共 {len(page_list)} 个）",
+                       level=logging.WARNING, event="sitemap")
+        page_list = page_list[:max_sitemap_pages]
+    add_debug_info(f"读取了 {files_read} 个站点地图/订阅源，找到 {len(pdf_links)} 个PDF链接、"
+                   f"{len(page_list)} 个内容页面", event="sitemap")
+    return list(pdf_links.items()), page_list
+
+def get_pdf_links(url, start_year=None, end_year=None, max_depth=3, ctx=None,
+                  fetchers=default_discovery_workers, on_pdf=None, sitemaps=False, resume=None,
+                  max_pages=default_max_pages):
+    """从起始页面开始查找PDF链接，多个线程并发抓取页面
+
+    子页面按 LinkScorer 的得分从高到低抓取；max_pages 大于0时抓取这么多页面后停止。
+    on_pdf(url, 链接文本) 在每发现一个新的PDF链接时被调用，用于边查找边下载；此时链接只交给回调，
+    不在内存中保留列表，返回空列表。页面和PDF都按规范化的URL去重（见 canonical_url）。
+    sitemaps 为True时先读取站点地图和订阅源：从中找到内容时，其中的页面只抓取
+    不再深入，起始页面也只浅层遍历（补充站点地图尚未收录的新内容）；找不到时
+    照常完整遍历。
+    resume 为 CrawlCheckpoint.load() 的返回值，从中断处继续，不再从起始页面开始。
+    起始页面是否获取成功记录在当前任务的 start_page_ok 中。
+    """
+    frontier = CrawlFrontier(max_pages)
+    scorer = LinkScorer(start_year, end_year)
+    checkpoint = ctx.checkpoint if ctx is not None else None
+    pdf_links = []  # 没有 on_pdf 回调时收集的链接
+    found = FingerprintSet()
+    found_lock = threading.Lock()
+    job = current_job()
+    
+    def add_pdfs(page_pdfs):
+        new_links = []
+        with found_lock:
+            for pdf_url, text in page_pdfs:
+                if found.add(pdf_url):
+                    new_links.append((pdf_url, text))
+        if on_pdf is None:
+            pdf_links.extend(pdf_url for pdf_url, _ in new_links)
+        # 在锁外回调，回调可能因下载队列已满而阻塞
+        if on_pdf:
+            for pdf_url, text in new_links:
+                on_pdf(pdf_url, text)
+    
+    def push(page_url, depth, text=''):
+        if not frontier.push(page_url, depth, scorer.score(page_url, text, depth)):
+            return False
+        if checkpoint is not None:
+            checkpoint.page_queued(page_url, depth)
+        return True
+    
+    initial_pdfs = []  # 页面抓取线程启动后再交给下载线程的PDF
+    if resume:
+        pages, seen, pdfs = resume
+        frontier.mark_seen(seen)
+        for page_url, depth in pages:
+            frontier.push(page_url, depth, scorer.score(page_url, '', depth))
+        # 已下载的PDF不再交给下载线程
+        with found_lock:
+            for pdf_url, _, done in pdfs:
+                if done:
+                    found.add(pdf_url)
+        initial_pdfs = [(pdf_url, text) for pdf_url, text, done in pdfs if not done]
+        add_debug_info(f"从检查点继续: 已抓取页面 {len(seen)} 个，待抓取 {len(pages)} 个，"
+                       f"已下载PDF {len(found)} 个，待下载 {len(initial_pdfs)} 个", event="resume")
+    else:
+        sitemap_pages = []
+        if sitemaps:
+            initial_pdfs, sitemap_pages = discover_from_sitemaps(url, start_year, end_year, get_context(ctx))
+            if not (initial_pdfs or sitemap_pages):
+                add_debug_info("站点地图中没有找到内容，完整遍历网页")
+        if initial_pdfs or sitemap_pages:
+            push(url, max(max_depth - 1, 0))
+            for page_url in sitemap_pages:
+                push(page_url, max_depth)
+        else:
+            push(url, 0)
+    
+    def fetch_worker():
+        bind_job(job)
+        while True:
+            item = frontier.pop()
+            if item is None:
+                return
+            page_url, depth = item
+            try:
+                page_pdfs, subpages = fetch_page_links(page_url, start_year, end_year, depth, ctx)
+                if page_url == url and job is not None:
+                    job.start_page_ok = page_pdfs is not None
+                page_pdfs = page_pdfs or []
+                scorer.record(page_url, len(page_pdfs))
+                add_pdfs(page_pdfs)
+                
+                # 子页面放入队列，由空闲线程按得分继续抓取
+                if depth < max_depth:
+                    for subpage_url, subpage_text in subpages:
+                        if push(subpage_url, depth + 1, subpage_text):
+                            add_debug_info("加入待检查页面: %s -> %s", subpage_text, subpage_url,
+                                           level=logging.DEBUG, url=subpage_url)
+                if checkpoint is not None:
+                    checkpoint.page_done(page_url, depth)
+            finally:
+                frontier.task_done()
+    
+    threads = [threading.Thread(target=fetch_worker, name=f"page-fetch-{i}", daemon=True)
+               for i in range(max(1, fetchers))]
+    for thread in threads:
+        thread.start()
+    # 页面抓取线程启动后再交出站点地图（或检查点）中的PDF，下载队列满时不耽误页面抓取
+    add_pdfs(initial_pdfs)
+    for thread in threads:
+        thread.join()
+    
+    add_debug_info(f"共检查 {frontier.visited_count()} 个页面，找到 {len(found)} 个PDF链接")
+    return pdf_links
+
+def parse_int_param(value, default, lower=1, upper=max_download_workers):
+    """解析整数参数（线程数、重试次数等），非法值时使用默认值"""
+    try:
+        count = int(value)
+    except (TypeError, ValueError):
+        return default
+    return min(max(count, lower), upper)
+
+def new_progress():
+    """返回一份新的进度信息"""
+    return {"total": 0, "current": 0, "filename": "", "percentage": 0, "unchanged": 0, "duplicates": 0,
+            "discovering": False, "first_file_seconds": None}
+
+def format_time(timestamp):
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(timestamp)) if timestamp else None
+
+class CrawlJob:
+    """一次爬取任务，保存参数、进度、调试信息和运行状态"""
+
+    def __init__(self, base_url, download_folder, start_year=None, end_year=None, options=None,
+                 log_level=None):
+        self.id = uuid.uuid4().hex[:12]
+        # 传入多个网址时由 crawl_sharded 分给多个进程爬取
+        self.base_urls = list(base_url) if isinstance(base_url, (list, tuple)) else [base_url]
+        self.base_url = " ".join(self.base_urls)
+        self.download_folder = download_folder
+        self.start_year = start_year
+        self.end_year = end_year
+        self.options = options or {}  # 传给 crawl_pdfs 的其他参数
+        self.state = "queued"  # queued / running / finished / failed
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.progress = new_progress()
+        self.progress_lock = threading.Lock()  # 多个下载线程共同更新进度
+        self.context = None  # 运行时的 CrawlContext，用于统计连接和主机状态
+        self.downloaded = []
+        self.log_level = log_level  # 为None时使用全局日志级别
+        self.events = EventLog()
+        self.start_page_ok = None  # 起始页面获取成功为True，失败为False，没有抓取（如从检查点继续）为None
+
+    @property
+    def active(self):
+        return self.state in ("queued", "running")
+
+    def log_entries(self):
+        return self.events.messages()
+
+    def snapshot(self, include_log=True):
+        """返回任务状态，用于 /jobs 和 /status"""
+        with self.progress_lock:
+            progress = dict(self.progress)
+        data = {
+            "id": self.id,
+            "base_url": self.base_url,
+            "base_urls": self.base_urls,
+            "download_folder": self.download_folder,
+            "start_year": self.start_year,
+            "end_year": self.end_year,
+            "state": self.state,
+            "running": self.active,
+            "created_at": format_time(self.created_at),
+            "started_at": format_time(self.started_at),
+            "finished_at": format_time(self.finished_at),
+            "downloaded": len(self.downloaded),
+            "progress": progress,
+            "connections": self.context.connection_stats() if self.context else None,
+            "hosts": self.context.scheduler.snapshot() if self.context else {},
+            "transfer": self.context.transfer.snapshot() if self.context else None,
+        }
+        if include_log:
+            data["debug_info"] = self.log_entries()
+        return data
+
+class JobManager:
+    """爬取任务队列：每个任务在自己的线程中运行，同时运行的任务数不超过上限"""
+
+    def __init__(self, max_running=max_concurrent_jobs, max_history=max_finished_jobs):
+        self.max_running = max(1, max_running)
+        self.max_history = max_history
+        self._lock = threading.Lock()
+        self._jobs = collections.OrderedDict()
+        self._pending = collections.deque()
+        self._running = 0
+
+    def submit(self, job):
+        """加入任务队列，有空闲名额时立即开始运行"""
+        with self._lock:
+            self._jobs[job.id] = job
+            self._pending.append(job)
+        self._start_pending()
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self):
+        """按创建时间倒序返回所有任务"""
+        with self._lock:
+            return list(reversed(self._jobs.values()))
+
+    def latest(self):
+        with self._lock:
+            return next(reversed(self._jobs.values()), None)
+
+    def running_count(self):
+        with self._lock:
+            return self._running
+
+    def pending_count(self):
+        with self._lock:
+            return len(self._pending)
+
+    def _start_pending(self):
+        to_start = []
+        with self._lock:
+            while self._pending and self._running < self.max_running:
+                to_start.append(self._pending.popleft())
+                self._running += 1
+        for job in to_start:
+            threading.Thread(target=self._run, args=(job,), name=f"crawl-{job.id}", daemon=True).start()
+
+    def _run(self, job):
+        try:
+            if len(job.base_urls) > 1:
+                crawl_sharded(job.base_urls, job.download_folder, job.start_year, job.end_year,
+                              job=job, **job.options)
+            else:
+                options = {key: value for key, value in job.options.items() if key != "processes"}
+                crawl_pdfs(job.base_url, job.download_folder, job.start_year, job.end_year, job=job, **options)
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._trim_history()
+            self._start_pending()
+
+    def _trim_history(self):
+        """只保留最近的已结束任务，调用方需持有锁"""
+        finished = [job_id for job_id, job in self._jobs.items() if not job.active]
+        for job_id in finished[:max(len(finished) - self.max_history, 0)]:
+            del self._jobs[job_id]
+
+job_manager = JobManager()
+
+def crawl_pdfs(base_url, download_folder, start_year=None, end_year=None,
+               workers=default_download_workers, per_host_limit=default_per_host_limit,
+               retries=default_retries, backoff_factor=default_backoff_factor, incremental=False,
+               discovery_workers=default_discovery_workers, chunk_size=default_chunk_size,
+               host_rate=default_host_rate, respect_robots=False, pdf_metadata=True,
+               page_cache=False, cache_ttl=None, cache_ttl_by_depth=None, sitemaps=False, resume=False,
+               max_pages=default_max_pages, bandwidth_limit=default_bandwidth_limit,
+               byte_budget=default_byte_budget, min_free_space=default_min_free_space, job=None, claim=None):
+    """爬取网站上的所有PDF
+
+    进度和调试信息写入 job；未传入 job 时（直接调用）新建一个。
+    所有下载线程共用 bandwidth_limit（字节/秒）和 byte_budget（字节）；下载目录所在磁盘的
+    空闲空间少于 min_free_space 时不再下载，已开始的文件停在当前位置，以后可以续传。
+    爬取过程中定期在下载目录中保存检查点；resume 为True时从上次中断的检查点继续，
+    没有可用的检查点时从头开始。爬取完整结束后删除检查点。
+    claim(url) 返回False的PDF链接已由其他分片负责，不计入总数也不下载。
+    """
+    global last_run_time
+    if job is None:
+        job = CrawlJob(base_url, download_folder, start_year, end_year)
+    previous_job = current_job()
+    bind_job(job)
+    ctx = CrawlContext(pool_size=workers + discovery_workers, retries=retries,
+                       backoff_factor=backoff_factor, incremental=incremental, chunk_size=chunk_size,
+                       host_rate=host_rate, per_host_limit=per_host_limit, respect_robots=respect_robots,
+                       pdf_metadata=pdf_metadata)
+    job.context = ctx
+    progress = job.progress
+    progress_lock = job.progress_lock
+    progress["discovering"] = True
+    job.state = "running"
+    job.started_at = started_at = time.time()
+    
+    try:
+        add_debug_info(f"开始爬取PDF，网站: {base_url}")
+        add_debug_info(f"下载路径: {download_folder}")
+        add_debug_info(f"年份范围: {start_year} - {end_year}")
+        add_debug_info(f"下载线程数: {workers}, 单主机并发上限: {per_host_limit}, "
+                       f"页面抓取线程数: {discovery_workers}")
+        add_debug_info(f"单主机请求速率: {host_rate or '不限'} 次/秒, "
+                       f"遵守robots.txt抓取间隔: {'是' if respect_robots else '否'}")
+        add_debug_info(f"增量模式: {'开启' if incremental else '关闭'}")
+        if max_pages:
+            add_debug_info(f"页面数上限: {max_pages}")
+        if bandwidth_limit or byte_budget:
+            add_debug_info(f"下载带宽上限: {f'{bandwidth_limit:.0f} 字节/秒' if bandwidth_limit else '不限'}, "
+                           f"下载字节预算: {f'{byte_budget} 字节' if byte_budget else '不限'}")
+        if resume:
+            add_debug_info("从上次中断的检查点继续")
+        
+        # 确保下载目录存在
+        if not os.path.exists(download_folder):
+            os.makedirs(download_folder)
+            add_debug_info(f"创建下载目录: {download_folder}")
+        ctx.manifest = DownloadManifest(download_folder)
+        ctx.transfer = TransferLimiter(download_folder, bandwidth_limit, byte_budget, min_free_space)
+        if page_cache:
+            ctx.page_cache = PageCache(os.path.join(download_folder, page_cache_file_name),
+                                       ttl=cache_ttl, ttl_by_depth=cache_ttl_by_depth)
+            add_debug_info(f"列表页缓存: 开启, 有效期: {'按服务器设置' if cache_ttl is None else f'{cache_ttl} 秒'}")
+        ctx.checkpoint = CrawlCheckpoint(download_folder, base_url, start_year, end_year)
+        resume_state = ctx.checkpoint.load() if resume else None
+        if resume and resume_state is None:
+            add_debug_info("没有可以继续的检查点，从头开始爬取", event="resume")
+        if resume_state is None:
+            ctx.checkpoint.reset()
+        
+        # 定义进度更新函数（会被多个下载线程同时调用）
+        def update_progress(success=False, skipped=False, filename="", unchanged=False, duplicate=False):
+            with progress_lock:
+                if success or skipped or unchanged:
+                    progress["current"] += 1
+                if unchanged:
+                    progress["unchanged"] += 1
+                if duplicate:
+                    progress["duplicates"] += 1
+                
+                if success and filename:
+                    progress["filename"] = filename
+                    if progress["first_file_seconds"] is None:
+                        progress["first_file_seconds"] = round(time.time() - started_at, 2)
+                
+                if progress["total"] > 0:
+                    progress["percentage"] = int((progress["current"] / progress["total"]) * 100)
+                else:
+                    progress["percentage"] = 100
+        
+        link_queue = queue.Queue(maxsize=download_queue_size)
+        end_of_links = object()
+        
+        def enqueue_link(link, text=''):
+            """发现新PDF链接时增加总数并交给下载线程；队列满时阻塞"""
+            if claim is not None and not claim(link):
+                add_debug_info("已由其他网站的分片下载: %s", link, level=logging.DEBUG, url=link)
+                return
+            with progress_lock:
+                progress["total"] += 1
+                count = progress["total"]
+                progress["percentage"] = int((progress["current"] / count) * 100)
+            add_debug_info("链接 %d: %s", count, link, level=logging.DEBUG, url=link)
+            ctx.checkpoint.pdf_found(link, text)
+            link_queue.put((link, text))
+        
+        def download_loop():
+            """从队列中取链接下载，直到收到结束标记"""
+            downloaded = []
+            while True:
+                item = link_queue.get()
+                if item is end_of_links:
+                    return downloaded
+                link, text = item
+                with progress_lock:
+                    progress["filename"] = link.split('/')[-1]  # 设置当前正在下载的文件名
+                # 下载线程出错退出后队列不再被取走，查找链接的线程会阻塞在 put 上，所以这里不让异常传出
+                try:
+                    filename = download_pdf(link, download_folder, update_progress, ctx=ctx, text=text)
+                    if filename:
+                        downloaded.append(link)
+                        ctx.checkpoint.pdf_done(link)
+                except Exception as e:
+                    add_debug_info(f"处理下载结果时出错: {str(e)}, URL: {link}", level=logging.ERROR,
+                                   url=link, event="download_failed")
+        
+        # 下载线程先启动，查找到的链接立即进入下载队列
+        downloaded_files = []
+        worker_count = max(1, workers)
+        with ThreadPoolExecutor(max_workers=worker_count, thread_name_prefix="pdf-download",
+                                initializer=bind_job, initargs=(job,)) as executor:
+            futures = [executor.submit(download_loop) for _ in range(worker_count)]
+            try:
+                get_pdf_links(base_url, start_year, end_year, ctx=ctx,
+                              fetchers=discovery_workers, on_pdf=enqueue_link, sitemaps=sitemaps,
+                              resume=resume_state, max_pages=max_pages)
+            finally:
+                with progress_lock:
+                    progress["discovering"] = False
+                for _ in futures:
+                    link_queue.put(end_of_links)
+            for future in futures:
+                downloaded_files.extend(future.result())
+        # 重名的文件可能在下载之后被改名（见 _place_download），按清单取最终的文件名
+        downloaded_files = [ctx.manifest.get(link)["file_name"] for link in downloaded_files]
+        
+        add_debug_info(f"爬取完成，成功下载 {len(downloaded_files)} 个文件"
+                       f"（其中内容重复 {progress['duplicates']} 个），"
+                       f"未变化跳过 {progress['unchanged']} 个")
+        if ctx.transfer.exhausted():
+            add_debug_info(f"下载字节预算已用完（{ctx.transfer.used} / {byte_budget} 字节），"
+                           f"其余PDF没有下载", level=logging.WARNING, event="budget")
+        last_run_time = time.strftime("%Y-%m-%d %H:%M:%S")
+        
+        with progress_lock:
+            progress["filename"] = "完成"
+            progress["percentage"] = 100
+        if progress["first_file_seconds"] is not None:
+            add_debug_info(f"首个文件用时 {progress['first_file_seconds']} 秒，"
+                           f"总用时 {round(time.time() - started_at, 2)} 秒")
+        
+        job.downloaded = downloaded_files
+        job.state = "finished"
+        ctx.checkpoint.finish()
+        return downloaded_files
+    except Exception as e:
+        add_debug_info(f"爬取过程中出错: {str(e)}", level=logging.ERROR, event="crawl_failed")
+        job.state = "failed"
+        return []
+    finally:
+        ctx.close()
+        stats = ctx.connection_stats()
+        add_debug_info(f"HTTP请求 {stats['requests']} 次, 新建连接 {stats['connections']} 个, "
+                       f"复用 {stats['reused']} 次")
+        job.finished_at = time.time()
+        job.events.notify()
+        bind_job(previous_job)
+
+def shard_by_host(base_urls):
+    """按主机分组，同一主机的网址在同一个进程中依次爬取（主机的并发和限速只在一个进程内生效）"""
+    groups = collections.OrderedDict()
+    for url in base_urls:
+        groups.setdefault(urlparse(url).netloc.lower(), []).append(url)
+    return list(groups.values())
+
+def _run_shard(base_urls, download_folder, start_year, end_year, options, log_level, claimed, lock, updates):
+    """在分片进程中依次爬取一组网址，定期把进度和新日志发给主进程
+
+    claimed 是进程间共享的字典（PDF URL的指纹 -> 负责的网址），第一个发现该PDF的网址负责下载；
+    按指纹判断，协议、#片段或参数顺序不同的同一个PDF只下载一次。
+    """
+    global _shared_folder_lock
+    _shared_folder_lock = lock
+    logger.disabled = True  # 日志由主进程统一输出
+    for base_url in base_urls:
+        job = CrawlJob(base_url, download_folder, start_year, end_year, log_level=log_level)
+        finished = threading.Event()
+        
+        def report(job=job):
+            cursor = 0
+            while True:
+                done = finished.wait(shard_report_interval)
+                with job.progress_lock:
+                    progress = dict(job.progress)
+                records = job.events.read(cursor)
+                if records:
+                    cursor = records[-1]["seq"]
+                updates.put(("progress", base_url, job.started_at, progress, records))
+                if done:
+                    return
+        
+        reporter = threading.Thread(target=report, name="shard-report", daemon=True)
+        reporter.start()
+        try:
+            downloaded = crawl_pdfs(base_url, download_folder, start_year, end_year, job=job,
+                                    claim=lambda link, owner=base_url:
+                                        claimed.setdefault(url_fingerprint(link), owner) == owner,
+                                    **options)
+        finally:
+            finished.set()
+            reporter.join()
+        updates.put(("done", base_url, job.state, downloaded, job.start_page_ok))
+
+def crawl_sharded(base_urls, download_folder, start_year=None, end_year=None, processes=None, job=None,
+                  **options):
+    """用多个进程同时爬取多个网站，按主机分片，下载到同一目录
+
+    各分片的进度汇总到 job.progress，日志加上主机名后写入 job 的日志；同一个PDF
+    只由第一个发现它的分片下载。带宽上限由同时运行的进程平分，字节预算由各网站平分。
+    其他参数与 crawl_pdfs 相同。返回下载的文件名列表。
+    """
+    global last_run_time
+    if job is None:
+        job = CrawlJob(list(base_urls), download_folder, start_year, end_year)
+    previous_job = current_job()
+    bind_job(job)
+    shards = shard_by_host(base_urls)
+    processes = min(parse_int_param(processes, os.cpu_count() or 1, upper=max_shard_processes), len(shards))
+    # 每个进程只能限制自己的传输，按份额分配后总量不超过设置
+    options = dict(options)
+    if options.get("bandwidth_limit"):
+        options["bandwidth_limit"] = options["bandwidth_limit"] / processes
+    if options.get("byte_budget"):
+        options["byte_budget"] = max(options["byte_budget"] // len(base_urls), 1)
+    job.state = "running"
+    job.started_at = started_at = time.time()
+    job.progress["discovering"] = True
+    shard_progress = {}
+    shard_states = {}
+    downloaded_files = []
+    
+    def merge_progress():
+        """把各分片的进度加起来写入 job.progress"""
+        parts = list(shard_progress.values())
+        first_file = [shard_started + p["first_file_seconds"] - started_at
+                      for shard_started, p in parts if shard_started and p["first_file_seconds"] is not None]
+        with job.progress_lock:
+            progress = job.progress
+            for key in ("total", "current", "unchanged", "duplicates"):
+                progress[key] = sum(p[key] for _, p in parts)
+            # 还有网站没开始爬取，或者有分片仍在查找链接
+            progress["discovering"] = (len(parts) < len(base_urls) or any(p["discovering"] for _, p in parts))
+            progress["percentage"] = int(progress["current"] / progress["total"] * 100) if progress["total"] else 0
+            if first_file and progress["first_file_seconds"] is None:
+                progress["first_file_seconds"] = round(max(min(first_file), 0), 2)
+            current = [p["filename"] for _, p in parts if p["filename"] and p["filename"] != "完成"]
+            if current:
+                progress["filename"] = current[-1]
+    
+    try:
+        add_debug_info(f"分片爬取 {len(base_urls)} 个网站（{len(shards)} 个主机），进程数: {processes}")
+        os.makedirs(download_folder, exist_ok=True)
+        mp_context = multiprocessing.get_context("spawn")  # 父进程有多个线程，不使用fork
+        with mp_context.Manager() as manager, \
+                ProcessPoolExecutor(max_workers=processes, mp_context=mp_context) as executor:
+            claimed = manager.dict()
+            lock = manager.Lock()
+            updates = manager.Queue()
+            futures = {executor.submit(_run_shard, shard, download_folder, start_year, end_year, options,
+                                       job.log_level, claimed, lock, updates): shard for shard in shards}
+            pending = set(futures)
+            while pending or not updates.empty():
+                try:
+                    kind, base_url, first, second, third = updates.get(timeout=shard_report_interval)
+                except queue.Empty:
+                    for future in [f for f in pending if f.done()]:
+                        pending.discard(future)
+                        error = future.exception()
+                        if error is not None:
+                            add_debug_info(f"分片进程出错: {str(error)}", level=logging.ERROR, event="crawl_failed")
+                            for url in futures[future]:
+                                shard_states.setdefault(url, "failed")
+                    continue
+                host = urlparse(base_url).netloc
+                if kind == "progress":
+                    shard_progress[base_url] = (first, second)
+                    for record in third:
+                        level = logging.getLevelName(record["level"])
+                        message = f"[{host}] {record['message']}"
+                        job.events.append(level, message, job.id, record["url"], record["event"])
+                        logger.log(level, message)
+                else:
+                    shard_states[base_url] = first
+                    downloaded_files.extend(second)
+                    if third is False:
+                        job.start_page_ok = False  # 任一网站的起始页面获取失败
+                    elif third and job.start_page_ok is None:
+                        job.start_page_ok = True
+                merge_progress()
+        
+        add_debug_info(f"分片爬取完成，成功下载 {len(downloaded_files)} 个文件，"
+                       f"未变化跳过 {job.progress['unchanged']} 个")
+        last_run_time = time.strftime("%Y-%m-%d %H:%M:%S")
+        get_catalog(download_folder).sync()  # 分片进程保存的文件补充到本进程的文件索引
+        with job.progress_lock:
+            job.progress["discovering"] = False
+            job.progress["filename"] = "完成"
+            job.progress["percentage"] = 100
+        job.downloaded = downloaded_files
+        job.state = "failed" if "failed" in shard_states.values() else "finished"
+        return downloaded_files
+    except Exception as e:
+        add_debug_info(f"分片爬取过程中出错: {str(e)}", level=logging.ERROR, event="crawl_failed")
+        job.state = "failed"
+        return downloaded_files
+    finally:
+        job.finished_at = time.time()
+        job.events.notify()
+        bind_job(previous_job)
+
+class DownloadCatalog:
+    """下载目录的文件索引：内存中保存每个文件的大小、修改时间、来源URL和年月，并持久化到SQLite
+
+    下载完成时由下载线程更新，页面和 /status 直接读取索引，不再逐个查询文件系统。
+    """
+
+    sort_keys = ("mtime", "name", "size")
+
+    def __init__(self, folder):
+        self.folder = folder
+        self._lock = threading.Lock()
+        self._files = {}
+        self._sorted = {}  # (排序字段, 是否倒序) -> 排好序的文件列表，索引变化时清空
+        os.makedirs(folder, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(folder, manifest_file_name), check_same_thread=False)
+        with self._lock:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS files (
+                    name TEXT PRIMARY KEY,
+                    size INTEGER,
+                    mtime REAL,
+                    source_url TEXT,
+                    year TEXT,
+                    month TEXT
+                )
+            """)
+            self._conn.commit()
+            for name, size, mtime, source_url, year, month in self._conn.execute(
+                    "SELECT name, size, mtime, source_url, year, month FROM files"):
+                self._files[name] = {"name": name, "size": size, "mtime": mtime,
+                                     "source_url": source_url, "year": year, "month": month}
+        self.sync()
+
+    def _make_entry(self, name, stat, source_url=None):
+        info = parse_link("", name)
+        return {
+            "name": name,
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "source_url": source_url,
+            "year": str(info.year) if info.year else None,
+            "month": f"{info.month:02d}" if info.month else None,
+        }
+
+    def _save(self, entries):
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO files (name, size, mtime, source_url, year, month) VALUES (?, ?, ?, ?, ?, ?)",
+            [(e["name"], e["size"], e["mtime"], e["source_url"], e["year"], e["month"]) for e in entries])
+
+    def sync(self):
+        """扫描一次目录，补充新文件、移除已删除的文件"""
+        on_disk = {}
+        with os.scandir(self.folder) as entries:
+            for entry in entries:
+                if entry.name.startswith('.') or not entry.is_file():
+                    continue
+                on_disk[entry.name] = entry.stat()
+        with self._lock:
+            changed = []
+            for name, stat in on_disk.items():
+                known = self._files.get(name)
+                if known is None or known["size"] != stat.st_size or known["mtime"] != stat.st_mtime:
+                    entry = self._make_entry(name, stat, known["source_url"] if known else None)
+                    self._files[name] = entry
+                    changed.append(entry)
+            removed = [name for name in self._files if name not in on_disk]
+            for name in removed:
+                del self._files[name]
+            if changed or removed:
+                self._save(changed)
+                self._conn.executemany("DELETE FROM files WHERE name = ?", [(name,) for name in removed])
+                self._conn.commit()
+                self._sorted.clear()
+
+    def add(self, name, source_url=None):
+        """记录新下载（或被覆盖）的文件"""
+        stat = os.stat(os.path.join(self.folder, name))
+        entry = self._make_entry(name, stat, source_url)
+        with self._lock:
+            self._files[name] = entry
+            self._save([entry])
+            self._conn.commit()
+            self._sorted.clear()
+
+    def rename(self, old_name, new_name, source_url=None):
+        """记录被改名的文件，source_url 为改名后文件的来源（默认沿用原来的）"""
+        with self._lock:
+            entry = self._files.pop(old_name, None)
+            self._conn.execute("DELETE FROM files WHERE name = ?", (old_name,))
+        self.add(new_name, source_url or (entry["source_url"] if entry else None))
+
+    def count(self):
+        with self._lock:
+            return len(self._files)
+
+    def page(self, page=1, per_page=50, sort="mtime", descending=True, year=None):
+        """分页返回文件列表，返回 (符合条件的总数, 当前页的文件)"""
+        if sort not in self.sort_keys:
+            sort = "mtime"
+        with self._lock:
+            key = (sort, descending)
+            if key not in self._sorted:
+                self._sorted[key] = sorted(self._files.values(), key=lambda e: e[sort], reverse=descending)
+            files = self._sorted[key]
+        if year:
+            files = [e for e in files if e["year"] == str(year)]
+        start = (max(page, 1) - 1) * per_page
+        return len(files), [dict(e, modified=format_time(e["mtime"])) for e in files[start:start + per_page]]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+
+def get_catalog(folder):
+    """返回下载目录的文件索引，第一次访问时从SQLite加载并扫描一次目录"""
+    key = os.path.abspath(folder)
+    with _catalogs_lock:
+        if key not in _catalogs:
+            _catalogs[key] = DownloadCatalog(folder)
+        return _catalogs[key]
+
+# 命令行入口的退出码
+exit_ok = 0
+exit_failed = 1  # 爬取过程中出错
+exit_usage = 2  # 参数错误（argparse的默认退出码）
+exit_incomplete = 3  # 爬取完成，但部分PDF没有下载成功
+
+def parse_years(value):
+    """解析 '2023-2025' 或 '2024' 形式的年份范围，返回 (起始年份, 结束年份)"""
+    match = re.fullmatch(r'\s*(\d{4})\s*(?:-\s*(\d{4})\s*)?', value or '')
+    if not match:
+        raise argparse.ArgumentTypeError(f"无效的年份范围: {value}，应为 2023-2025 或 2024")
+    start_year, end_year = match.group(1), match.group(2) or match.group(1)
+    if int(start_year) > int(end_year):
+        raise argparse.ArgumentTypeError(f"起始年份大于结束年份: {value}")
+    return start_year, end_year
+
+def parse_size(value):
+    """解析字节数，可以带 K/M/G 后缀（按1024计），如 512K、2M、1.5G"""
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([KMG]?)i?B?\s*', value or '', re.I)
+    if not match:
+        raise argparse.ArgumentTypeError(f"无效的大小: {value}，应为字节数或带 K/M/G 后缀，如 2M")
+    return int(float(match.group(1)) * 1024 ** " KMG".index(match.group(2).upper() or " "))
+
+def parse_depth_ttl(value):
+    """解析 '深度=秒数' 形式的缓存有效期，如 2=86400"""
+    depth, _, seconds = value.partition('=')
+    try:
+        return int(depth), float(seconds)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"无效的缓存有效期: {value}，应为 深度=秒数，如 2=86400")
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(
+        prog="pdf_scraper", description="造价信息PDF爬虫",
+        epilog=f"退出码: {exit_ok} 成功, {exit_failed} 爬取出错, {exit_usage} 参数错误, "
+               f"{exit_incomplete} 部分PDF下载失败")
+    commands = parser.add_subparsers(dest="command", required=True)
+    crawl = commands.add_parser("crawl", help="爬取网站并下载PDF")
+    crawl.add_argument("urls", nargs="+", metavar="url", help="要抓取的网站URL，多个网站时按主机分给多个进程")
+    crawl.add_argument("--years", type=parse_years, default=(None, None), help="年份范围，如 2023-2025 或 2024")
+    crawl.add_argument("--out", default=default_download_folder, help="下载目录")
+    crawl.add_argument("--workers", type=int, default=default_download_workers, help="下载线程数")
+    crawl.add_argument("--discovery-workers", type=int, default=default_discovery_workers, help="页面抓取线程数")
+    crawl.add_argument("--per-host", type=int, default=default_per_host_limit, help="同一主机的最大并发请求数")
+    crawl.add_argument("--host-rate", type=float, default=default_host_rate, help="每个主机每秒最多发送的请求数，0为不限")
+    crawl.add_argument("--processes", type=int, default=None,
+                       help="同时爬取多个网站时的进程数（默认为CPU核数）")
+    crawl.add_argument("--bandwidth", type=parse_size, default=default_bandwidth_limit,
+                       help="所有下载共用的带宽上限（字节/秒，可带K/M后缀，如 2M），0为不限")
+    crawl.add_argument("--max-bytes", type=parse_size, default=default_byte_budget,
+                       help="最多下载的PDF字节数（可带K/M/G后缀，多个网站时平分），0为不限")
+    crawl.add_argument("--min-free-space", type=parse_size, default=default_min_free_space,
+                       help="下载目录所在磁盘至少保留的空闲空间（可带K/M/G后缀），默认512M")
+    crawl.add_argument("--retries", type=int, default=default_retries, help="连接错误和5xx响应的重试次数")
+    crawl.add_argument("--incremental", action="store_true", help="增量模式，跳过未变化的文件")
+    crawl.add_argument("--resume", action="store_true", help="从上次中断的检查点继续（已抓取的页面和已下载的PDF不再重复）")
+    crawl.add_argument("--respect-robots", action="store_true", help="遵守robots.txt的抓取间隔")
+    crawl.add_argument("--max-pages", type=int, default=default_max_pages,
+                       help="每个网站最多抓取的页面数，0为不限（优先抓取得分高的页面）")
+    crawl.add_argument("--sitemaps", action="store_true",
+                       help="先从robots.txt/sitemap.xml和RSS/Atom订阅源中查找PDF，找到时只浅层遍历网页")
+    crawl.add_argument("--page-cache", action="store_true", help="在下载目录中缓存列表页，多次爬取之间复用")
+    crawl.add_argument("--cache-ttl", type=float, default=None,
+                       help="缓存的页面在多少秒内直接使用（默认按服务器的Cache-Control/Expires）")
+    crawl.add_argument("--cache-ttl-depth", type=parse_depth_ttl, action="append", default=[],
+                       metavar="DEPTH=SECONDS", help="按页面深度设置缓存有效期，可重复，如 0=0 --cache-ttl-depth 2=86400")
+    crawl.add_argument("--no-pdf-metadata", dest="pdf_metadata", action="store_false",
+                       help="不提取PDF的页数、标题和创建日期（仍校验文件头和结尾）")
+    crawl.add_argument("--log-level", default=None, help="日志级别 (DEBUG/INFO/WARNING/ERROR)")
+    crawl.add_argument("--quiet", action="store_true", help="只输出警告和错误")
+    return parser
+
+def main(argv=None):
+    """命令行入口，返回退出码"""
+    args = build_arg_parser().parse_args(argv)
+    level = logging.WARNING if args.quiet else parse_log_level(args.log_level, log_level)
+    configure_logging(level)
+    
+    start_year, end_year = args.years
+    job = CrawlJob(args.urls, args.out, start_year, end_year, log_level=level)
+    options = dict(workers=parse_int_param(args.workers, default_download_workers),
+                   per_host_limit=parse_int_param(args.per_host, default_per_host_limit),
+                   discovery_workers=parse_int_param(args.discovery_workers, default_discovery_workers),
+                   retries=parse_int_param(args.retries, default_retries, lower=0, upper=10),
+                   host_rate=max(args.host_rate, 0.0), incremental=args.incremental,
+                   respect_robots=args.respect_robots, pdf_metadata=args.pdf_metadata,
+                   page_cache=args.page_cache or args.cache_ttl is not None or bool(args.cache_ttl_depth),
+                   cache_ttl=args.cache_ttl, cache_ttl_by_depth=dict(args.cache_ttl_depth),
+                   sitemaps=args.sitemaps, resume=args.resume, max_pages=max(args.max_pages, 0),
+                   bandwidth_limit=args.bandwidth, byte_budget=args.max_bytes,
+                   min_free_space=args.min_free_space)
+    if len(args.urls) > 1:
+        downloaded = crawl_sharded(args.urls, args.out, start_year, end_year, processes=args.processes,
+                                   job=job, **options)
+    else:
+        downloaded = crawl_pdfs(args.urls[0], args.out, start_year, end_year, job=job, **options)
+    if job.state != "finished":
+        return exit_failed
+    # 首页无法访问时什么也抓不到，按失败处理（不依赖日志，日志级别较高时不会记录失败事件）
+    if job.start_page_ok is False:
+        return exit_failed
+    progress = job.progress
+    missing = progress["total"] - len(downloaded) - progress["unchanged"]
+    if missing > 0:
+        logger.warning("%d 个PDF没有下载成功", missing)
+        return exit_incomplete
+    return exit_ok
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,33 @@
+import sqlite3
+
+from pdf_scraper import CrawlCheckpoint
+
+
+class FailingConnection:
+    """写入时抛出 sqlite3.OperationalError 的连接，模拟磁盘已满或数据库被锁"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.failing = True
+
+    def executemany(self, *args):
+        if self.failing:
+            raise sqlite3.OperationalError("database is locked")
+        return self.conn.executemany(*args)
+
+    def __getattr__(self, name):
+        return getattr(self.conn, name)
+
+
+def test_write_errors_keep_changes_in_memory(tmp_path):
+    checkpoint = CrawlCheckpoint(str(tmp_path), "http://example.com/", interval=0)
+    checkpoint.reset()
+    conn = checkpoint._conn = FailingConnection(checkpoint._conn)
+
+    checkpoint.pdf_found("http://example.com/a.pdf", "2024年3月信息价")
+    checkpoint.pdf_done("http://example.com/a.pdf")
+
+    conn.failing = False
+    checkpoint.flush()
+    assert checkpoint.load()[2] == [("http://example.com/a.pdf", "2024年3月信息价", True)]
+    checkpoint.close()
@@ -0,0 +1,42 @@
+import pytest
+
+from pdf_scraper import LinkScorer, generate_file_name, is_page_in_year_range, parse_link
+
+
+@pytest.mark.parametrize("text, district", [
+    ("北京市海淀区2024年3月信息价", "海淀区"),
+    ("上海市浦东新区2024年3月信息价", "浦东新区"),
+    ("广东省深圳市南山区2024年3月信息价", "南山区"),
+    ("2024年3月信息价（朝阳区）", "朝阳区"),
+    ("2024年第一季度地区信息价", None),
+    ("2024年3月份郊区县信息价", None),
+    ("全省各市县2024年3月信息价", None),
+    ("某市住宅小区2024年3月造价信息", None),
+    ("2024年3月信息价", None),
+])
+def test_district(text, district):
+    assert parse_link("http://example.com/a.pdf", text).district == district
+
+
+def test_district_in_file_name():
+    assert generate_file_name("http://example.com/a.pdf", "a.pdf",
+                              "北京市海淀区2024年3月信息价") == "2024年03月海淀区信息价.pdf"
+    assert generate_file_name("http://example.com/a.pdf", "a.pdf",
+                              "2024年第一季度地区信息价") == "2024年信息价.pdf"
+
+
+@pytest.mark.parametrize("url, text, kept", [
+    ("http://example.com/col/col2019/index.html", "造价信息", True),
+    ("http://example.com/zjxx/list_2018.html", "信息价发布", True),
+    ("http://example.com/2019/03/index.html", "信息价", False),
+    ("http://example.com/zjxx/index.html", "2019年信息价", False),
+    ("http://example.com/2024/03/index.html", "信息价", True),
+])
+def test_subpage_pruned_only_on_reliable_year(url, text, kept):
+    assert is_page_in_year_range(url, text, 2023, 2025) is kept
+
+
+def test_bare_year_out_of_range_lowers_score():
+    scorer = LinkScorer(2023, 2025)
+    assert (scorer.score("http://example.com/col/col2019/index.html", "造价信息", 1)
+            < scorer.score("http://example.com/col/index.html", "造价信息", 1))
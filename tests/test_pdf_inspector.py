@@ -0,0 +1,36 @@
+import pytest
+
+import pdf_scraper
+from pdf_scraper import PdfInspector
+
+PDF = (b"%PDF-1.4\n"
+       b"1 0 obj\n<< /Type /Catalog /Pages 2 0 R /Outlines 4 0 R >>\nendobj\n"
+       b"2 0 obj\n<< /Type /Pages /Kids [3 0 R] /Count 1 >>\nendobj\n"
+       b"3 0 obj\n<< /Type /Page /Parent 2 0 R /Annots [7 0 R] >>\nendobj\n"
+       b"4 0 obj\n<< /Type /Outlines /First 5 0 R /Last 5 0 R >>\nendobj\n"
+       b"5 0 obj\n<< /Title (Chapter 1 Scope) /Parent 4 0 R /Dest [3 0 R /Fit] >>\nendobj\n"
+       b"7 0 obj\n<< /Type /Annot /Subtype /Text /CreationDate (D:20190101) >>\nendobj\n"
+       b"12 0 obj\n<< /Title (2024 Price Book) /CreationDate (D:20240315120000) >>\nendobj\n"
+       b"xref\n0 1\n0000000000 65535 f \n"
+       b"trailer\n<< /Size 13 /Root 1 0 R /Info 12 0 R >>\nstartxref\n0\n%%EOF\n")
+
+
+@pytest.mark.parametrize("chunk_size", [len(PDF), 7, 1])
+@pytest.mark.parametrize("margin", [4096, 64])
+def test_title_comes_from_info_dictionary(monkeypatch, chunk_size, margin):
+    monkeypatch.setattr(pdf_scraper, "pdf_scan_margin", margin)
+    inspector = PdfInspector()
+    for start in range(0, len(PDF), chunk_size):
+        inspector.feed(PDF[start:start + chunk_size])
+    inspector.finish()
+    metadata = inspector.metadata()
+    assert metadata["title"] == "2024 Price Book"
+    assert metadata["created"].startswith("2024-03-15")
+    assert metadata["pages"] == 1
+
+
+def test_no_info_dictionary():
+    inspector = PdfInspector()
+    inspector.feed(PDF.replace(b"/Info 12 0 R", b""))
+    inspector.finish()
+    assert inspector.metadata()["title"] is None
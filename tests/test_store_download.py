@@ -0,0 +1,64 @@
+import hashlib
+import os
+
+import pdf_scraper
+from pdf_scraper import CrawlContext, DownloadManifest, store_download
+
+
+def new_context(folder):
+    ctx = CrawlContext()
+    ctx.manifest = DownloadManifest(str(folder))
+    return ctx
+
+
+def save(ctx, folder, url, content, file_name="2024年03月信息价.pdf"):
+    part_path = os.path.join(str(folder), "download.part")
+    with open(part_path, "wb") as f:
+        f.write(content)
+    sha256 = hashlib.sha256(content).hexdigest()
+    return store_download(part_path, str(folder), file_name, url, ctx, sha256, len(content))
+
+
+def read(folder, file_name):
+    with open(os.path.join(str(folder), file_name), "rb") as f:
+        return f.read()
+
+
+def test_alias_keeps_content_when_original_url_changes(tmp_path):
+    ctx = new_context(tmp_path)
+    assert save(ctx, tmp_path, "http://a.example/a.pdf", b"old") == ("2024年03月信息价.pdf", False)
+    assert save(ctx, tmp_path, "http://a.example/b.pdf", b"old") == ("2024年03月信息价.pdf", True)
+
+    # A 更新后覆盖自己的文件，别名 B 的旧内容改名保留
+    assert save(ctx, tmp_path, "http://a.example/a.pdf", b"new") == ("2024年03月信息价.pdf", False)
+    moved = ctx.manifest.get("http://a.example/b.pdf")["file_name"]
+    assert moved != "2024年03月信息价.pdf"
+    assert read(tmp_path, moved) == b"old"
+    assert read(tmp_path, "2024年03月信息价.pdf") == b"new"
+
+    # B 重新下载到相同内容时仍指向保留下来的文件
+    assert save(ctx, tmp_path, "http://a.example/b.pdf", b"old") == (moved, True)
+    assert read(tmp_path, moved) == b"old"
+
+
+def test_same_crawl_name_does_not_depend_on_download_order(tmp_path):
+    ctx = new_context(tmp_path)
+    save(ctx, tmp_path, "http://a.example/z.pdf", b"second")
+    assert save(ctx, tmp_path, "http://a.example/a.pdf", b"first") == ("2024年03月信息价.pdf", False)
+    assert read(tmp_path, "2024年03月信息价.pdf") == b"first"
+    assert read(tmp_path, ctx.manifest.get("http://a.example/z.pdf")["file_name"]) == b"second"
+
+
+def test_archived_file_keeps_its_name(tmp_path):
+    ctx = new_context(tmp_path)
+    save(ctx, tmp_path, "http://a.example/z.pdf", b"archived")
+    ctx.manifest.close()
+
+    # 下一次爬取：排序靠前的新URL加后缀，以前保存的文件不改名
+    ctx = new_context(tmp_path)
+    file_name, duplicate = save(ctx, tmp_path, "http://a.example/a.pdf", b"later")
+    assert not duplicate
+    assert file_name == pdf_scraper.disambiguate_file_name("2024年03月信息价.pdf",
+                                                           hashlib.sha256(b"later").hexdigest())
+    assert read(tmp_path, "2024年03月信息价.pdf") == b"archived"
+    assert ctx.manifest.get("http://a.example/z.pdf")["file_name"] == "2024年03月信息价.pdf"